@@ -1,9 +1,75 @@
 import streamlit as st
+import os
 import random
 import ollama
-from datetime import datetime
+import tempfile
+import threading
+import uuid
+from collections import deque
+from datetime import datetime, time, timedelta
 from prompts import JOURNALING_PROMPTS
-from llm_analyzer import LLMAnalyzer
+from llm_analyzer import LLMAnalyzer, get_model_warmer, get_shared_client, get_model_catalog
+from journal_store import JournalStore, JournalWriteError
+from response_cache import ResponseCache
+from job_queue import JobQueue
+from exporter import render_session, export_archive
+from metrics import MetricsRecorder
+from scheduler import Scheduler, SchedulerBusy
+from single_flight import SingleFlight
+from embedding_index import EmbeddingIndex
+from prompt_recommender import PromptRecommender, load_prompt_library
+from structured_analysis import render_analysis
+from distortion_screen import screen, render_screen
+
+@st.cache_resource
+def get_journal_store():
+    """Open the journal database once per process and share it across sessions"""
+    return JournalStore()
+
+@st.cache_resource
+def get_response_cache():
+    """Share one LLM response cache across every session in the process"""
+    return ResponseCache()
+
+@st.cache_resource
+def get_metrics():
+    """Collect per-call LLM metrics for the whole process, optionally served for Prometheus"""
+    recorder = MetricsRecorder()
+    if os.getenv("METRICS_PORT"):
+        recorder.serve(int(os.getenv("METRICS_PORT")))
+    return recorder
+
+@st.cache_resource
+def get_scheduler():
+    """Admit LLM calls from every session through one priority-aware scheduler"""
+    return Scheduler()
+
+@st.cache_resource
+def get_single_flight():
+    """Share in-flight generations between identical requests from any session"""
+    return SingleFlight()
+
+@st.cache_resource
+def get_embedding_index():
+    """Open the semantic search index once and queue any stored entries it is missing"""
+    index = EmbeddingIndex(get_shared_client())
+    store = get_journal_store()
+    threading.Thread(
+        target=lambda: index.backfill(store.iter_sessions_between(datetime.min, datetime.max)),
+        name="embedding-backfill",
+        daemon=True
+    ).start()
+    return index
+
+@st.cache_resource
+def get_prompt_recommender():
+    """Embed the prompt library once per process for recommendations"""
+    return PromptRecommender(get_embedding_index(), load_prompt_library(JOURNALING_PROMPTS))
+
+@st.cache_resource
+def get_job_queue():
+    """Run LLM calls for every session on one shared background pool"""
+    return JobQueue()
 
 # Initialize session state
 if 'current_prompt' not in st.session_state:
@@ -14,83 +80,356 @@ if 'analysis_complete' not in st.session_state:
     st.session_state.analysis_complete = False
 if 'conversation_history' not in st.session_state:
     st.session_state.conversation_history = []
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = None
+if 'pending_job' not in st.session_state:
+    st.session_state.pending_job = None
+if 'summary_job' not in st.session_state:
+    st.session_state.summary_job = None
+if 'summary_content' not in st.session_state:
+    st.session_state.summary_content = None
+if 'speculative_summary' not in st.session_state:
+    st.session_state.speculative_summary = None
+if 'precompute_summary' not in st.session_state:
+    st.session_state.precompute_summary = False
+if 'history_version' not in st.session_state:
+    st.session_state.history_version = 0
+if 'export_cache' not in st.session_state:
+    st.session_state.export_cache = None
+if 'retry_analysis' not in st.session_state:
+    st.session_state.retry_analysis = False
+if 'job_error' not in st.session_state:
+    st.session_state.job_error = None
+if 'stream_responses' not in st.session_state:
+    st.session_state.stream_responses = True
+if 'recent_prompts' not in st.session_state:
+    st.session_state.recent_prompts = deque(maxlen=10)
+if 'structured_analysis' not in st.session_state:
+    st.session_state.structured_analysis = False
+if 'view' not in st.session_state:
+    st.session_state.view = "Journal"
+if 'client_key' not in st.session_state:
+    st.session_state.client_key = uuid.uuid4().hex
+
+def create_analyzer(model_name=None):
+    """Build this session's analyzer on the shared client, pinned to one Ollama host when pooled"""
+    client = get_shared_client()
+    if hasattr(client, 'for_session'):
+        client = client.for_session(st.session_state.client_key)
+    return LLMAnalyzer(
+        model_name,
+        cache=get_response_cache(),
+        client=client,
+        catalog=get_model_catalog(),
+        metrics=get_metrics(),
+        scheduler=get_scheduler(),
+        user=st.session_state.client_key,
+        single_flight=get_single_flight(),
+        index=get_embedding_index()
+    )
+
 if 'llm_analyzer' not in st.session_state:
     try:
-        st.session_state.llm_analyzer = LLMAnalyzer()
+        st.session_state.llm_analyzer = create_analyzer()
         st.session_state.ollama_available = True
+        get_model_warmer().warm(st.session_state.llm_analyzer.model_name)
     except Exception as e:
         st.session_state.llm_analyzer = None
         st.session_state.ollama_available = False
         st.session_state.ollama_error = str(e)
 
+if st.session_state.llm_analyzer is not None:
+    # Keep this session's model safe from other sessions' warm-up evictions
+    get_model_warmer().use(st.session_state.client_key, st.session_state.llm_analyzer.model_name)
+
 def get_new_prompt():
-    """Get a random journaling prompt"""
-    return random.choice(JOURNALING_PROMPTS)
+    """Get a journaling prompt related to recent entries, or a random one without Ollama"""
+    if not st.session_state.ollama_available:
+        return random.choice(JOURNALING_PROMPTS)
+    prompt = get_prompt_recommender().recommend(st.session_state.recent_prompts)
+    st.session_state.recent_prompts.append(prompt)
+    return prompt
+
+def cancel_jobs():
+    """Cancel any LLM jobs still running for this session"""
+    speculative = st.session_state.speculative_summary
+    for pending in (st.session_state.pending_job, st.session_state.summary_job, speculative):
+        if pending is not None and pending.get('id') is not None:
+            job = get_job_queue().pop(pending['id'])
+            if job is not None:
+                job.cancel()
+    st.session_state.pending_job = None
+    st.session_state.summary_job = None
+    st.session_state.summary_content = None
+    st.session_state.speculative_summary = None
+    st.session_state.retry_analysis = False
 
 def reset_session():
     """Reset the journaling session"""
+    cancel_jobs()
     st.session_state.current_prompt = None
     st.session_state.journal_entry = ""
     st.session_state.analysis_complete = False
     st.session_state.conversation_history = []
+    st.session_state.history_version += 1
+    st.session_state.session_id = None
+
+def record_message(message_type, content, model=None, index=True):
+    """Append a message to the conversation and persist it to the journal store.
+
+    index=False keeps placeholder text (a failed or cancelled analysis) out of semantic search.
+    """
+    st.session_state.conversation_history.append({
+        'type': message_type,
+        'content': content
+    })
+    st.session_state.history_version += 1
+    if st.session_state.session_id is None:
+        st.session_state.session_id = get_journal_store().create_session(
+            st.session_state.current_prompt, model
+        )
+    get_journal_store().add_message(st.session_state.session_id, message_type, content, model)
+    if st.session_state.ollama_available and index:
+        get_embedding_index().add(st.session_state.session_id, message_type, content, datetime.now().isoformat())
+    st.session_state.summary_content = None
+
+def flush_journal():
+    """Wait for queued journal writes, warning about any that could not be saved"""
+    try:
+        get_journal_store().flush()
+    except JournalWriteError as e:
+        st.warning(f"Some journal data was not saved: {str(e)}")
+
+def start_reply_job(kind, fn, *args, **extra):
+    """Queue an analysis or follow-up in the background and remember it as the pending reply"""
+    job = get_job_queue().submit(fn, *args, kind=kind)
+    st.session_state.pending_job = {'id': job.id, **extra}
+
+def start_analysis_job(analyzer, journal_text):
+    """Queue the entry analysis in the mode chosen in the sidebar"""
+    if st.session_state.structured_analysis:
+        analyze = analyzer.analyze_entry_structured
+    elif st.session_state.stream_responses:
+        analyze = analyzer.analyze_entry_stream
+    else:
+        analyze = analyzer.analyze_entry
+    start_reply_job('analysis', analyze, journal_text, model=analyzer.model_name, screen=screen(journal_text))
 
-def generate_export_content(include_summary=False):
-    """Generate content for export"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    content = f"Journal Session Export\n"
-    content += f"Date: {timestamp}\n"
-    content += "=" * 50 + "\n\n"
+def finish_reply_job(job):
+    """Record the outcome of a finished analysis or follow-up job"""
+    pending = st.session_state.pending_job
+    st.session_state.pending_job = None
+    get_job_queue().pop(job.id)
+    model_name = pending.get('model')
     
-    # Add the prompt
-    content += f"Journaling Prompt:\n{st.session_state.current_prompt}\n\n"
+    if job.kind == 'analysis':
+        if job.status == 'done' and st.session_state.llm_analyzer is not None:
+            # Keep a long entry's chunk notes with it, so follow-ups replay the analysed notes
+            entry = next((m for m in st.session_state.conversation_history if m['type'] == 'user_entry'), None)
+            notes = st.session_state.llm_analyzer.entry_notes(entry['content']) if entry is not None else None
+            if notes is not None:
+                entry['notes'] = notes
+                get_journal_store().set_entry_notes(st.session_state.session_id, notes)
+        if job.status == 'done' and isinstance(job.result, dict):
+            record_message('analysis', render_analysis(job.result), model_name)
+            get_journal_store().add_analysis(st.session_state.session_id, job.result)
+        elif job.status == 'done':
+            record_message('analysis', job.result, model_name)
+        elif isinstance(job.error, SchedulerBusy):
+            st.session_state.job_error = str(job.error)
+            st.session_state.retry_analysis = True
+        elif job.status == 'failed':
+            st.session_state.job_error = f"Unable to analyze entry: {str(job.error)}"
+            record_message('analysis', "AI analysis unavailable - Ollama connection failed. "
+                           "Here is a quick local check instead:\n\n" + render_screen(pending['screen']), index=False)
+        else:
+            record_message('analysis', "Analysis cancelled.", index=False)
+    elif job.kind == 'ai_response':
+        if job.status == 'done':
+            record_message('user_question', pending['question'], model_name)
+            record_message('ai_response', job.result, model_name)
+        elif isinstance(job.error, SchedulerBusy):
+            st.session_state.job_error = str(job.error)
+        elif job.status == 'failed':
+            st.session_state.job_error = f"Unable to continue conversation: {str(job.error)}"
+
+def update_speculative_summary():
+    """Keep a session summary precomputing in the background so the summary export is instant.
+
+    The summary tracks how many history items it covers. When follow-ups arrive it is
+    updated incrementally from the previous summary and only the new turns, one low
+    priority job at a time.
+    """
+    history = st.session_state.conversation_history
+    spec = st.session_state.speculative_summary
+    if spec is None:
+        spec = st.session_state.speculative_summary = {'id': None, 'text': None, 'version': 0}
     
-    # Add the journal entry
-    content += f"Your Reflection:\n{st.session_state.journal_entry}\n\n"
+    if spec['id'] is not None:
+        job = get_job_queue().get(spec['id'])
+        if job is None or not job.done:
+            return
+        collect_speculative_summary(job)
     
-    if st.session_state.conversation_history:
-        content += "Session Analysis & Conversation:\n"
-        content += "-" * 30 + "\n\n"
-        
-        for message in st.session_state.conversation_history:
-            if message['type'] == 'analysis':
-                content += "AI Analysis:\n"
-                content += message['content'] + "\n\n"
-            elif message['type'] == 'user_question':
-                content += "Your Question:\n"
-                content += message['content'] + "\n\n"
-            elif message['type'] == 'ai_response':
-                content += "AI Response:\n"
-                content += message['content'] + "\n\n"
+    if spec['version'] == len(history) or spec.get('failed_version') == len(history):
+        return
+    if st.session_state.pending_job is not None:
+        return
+    new_turns = history[spec['version']:] if spec['text'] is not None else history
+    job = get_job_queue().submit(
+        st.session_state.llm_analyzer.summarize_session,
+        st.session_state.current_prompt,
+        st.session_state.journal_entry,
+        new_turns,
+        spec['text'],
+        kind='summary',
+        background=True
+    )
+    spec['id'] = job.id
+    spec['job_version'] = len(history)
+
+def collect_speculative_summary(job):
+    """Store the result of a finished speculative summary job"""
+    spec = st.session_state.speculative_summary
+    get_job_queue().pop(job.id)
+    spec['id'] = None
+    if job.status == 'done':
+        spec['text'] = job.result
+        spec['version'] = spec['job_version']
+    elif job.status == 'failed':
+        spec['failed_version'] = spec['job_version']
+
+def ready_speculative_summary():
+    """Return the precomputed summary if it covers the whole conversation"""
+    spec = st.session_state.speculative_summary
+    if spec is not None and spec['text'] is not None and spec['version'] == len(st.session_state.conversation_history):
+        return spec['text']
+    return None
+
+@st.fragment(run_every=0.5)
+def render_pending_reply():
+    """Show the in-progress reply, refreshing on its own so the rest of the page stays interactive"""
+    job = get_job_queue().get(st.session_state.pending_job['id'])
+    if job is None:
+        st.session_state.pending_job = None
+        st.rerun()
+    if job.done:
+        finish_reply_job(job)
+        st.rerun()
     
-    # Add summary if requested and AI is available
-    if include_summary and st.session_state.ollama_available and st.session_state.llm_analyzer is not None:
-        try:
-            summary_prompt = f"""Please provide a concise summary of this journaling session focusing on:
-1. Key emotions and themes
-2. Main insights discovered
-3. Progress or growth identified
-4. Important action items or reflections to remember
-
-Session content:
-Prompt: {st.session_state.current_prompt}
-Entry: {st.session_state.journal_entry}
-"""
-            
-            analyzer = st.session_state.llm_analyzer
-            summary_response = analyzer.continue_conversation(
-                [{'type': 'user_entry', 'content': summary_prompt}], 
-                "Please provide the summary as requested."
-            )
-            
-            content += "\n" + "=" * 50 + "\n"
-            content += "SESSION SUMMARY\n"
-            content += "=" * 50 + "\n\n"
-            content += summary_response + "\n"
-            
-        except Exception:
-            content += "\n(Summary generation failed - exported full conversation instead)\n"
+    if job.kind == 'ai_response':
+        st.markdown("**You asked:**")
+        st.info(st.session_state.pending_job['question'])
+        st.markdown("**💭 AI Response:**")
+    else:
+        st.markdown("**🔍 Analysis:**")
+        if st.session_state.pending_job.get('screen'):
+            with st.expander("⚡ Quick check while the AI writes", expanded=not job.text):
+                st.markdown(render_screen(st.session_state.pending_job['screen']))
+    if job.text:
+        st.markdown(job.text)
+    else:
+        st.caption("Waiting for the model..." if job.status == 'queued' else "Thinking...")
+    if st.button("Cancel", key="cancel_reply"):
+        job.cancel()
+
+@st.fragment(run_every=0.5)
+def render_summary_job():
+    """Poll the background summary job and build the export once it finishes"""
+    job = get_job_queue().get(st.session_state.summary_job['id'])
+    if job is None:
+        st.session_state.summary_job = None
+        st.rerun()
+    if job.done:
+        st.session_state.summary_job = None
+        spec = st.session_state.speculative_summary
+        if spec is not None and spec['id'] == job.id:
+            collect_speculative_summary(job)
+        get_job_queue().pop(job.id)
+        if job.status == 'done':
+            st.session_state.summary_content = generate_export_content(summary=job.result)
+        elif job.status == 'failed':
+            st.session_state.summary_content = generate_export_content() + \
+                "\n(Summary generation failed - exported full conversation instead)\n"
+        st.rerun()
+    
+    st.caption("Creating summary...")
+    if st.button("Cancel", key="cancel_summary"):
+        job.cancel()
+
+def load_session(session):
+    """Restore a stored session into the current view"""
+    cancel_jobs()
+    history = [{'type': m['type'], 'content': m['content']} for m in session['messages']]
+    notes = get_journal_store().entry_notes(session['id'])
+    for message in history:
+        if message['type'] == 'user_entry' and notes is not None:
+            message['notes'] = notes
+    entry = next((m['content'] for m in history if m['type'] == 'user_entry'), "")
+    st.session_state.session_id = session['id']
+    st.session_state.current_prompt = session['prompt']
+    st.session_state.journal_entry = entry
+    st.session_state.conversation_history = history
+    st.session_state.history_version += 1
+    st.session_state.analysis_complete = True
+
+def generate_export_content(summary=None):
+    """Generate content for export, appending an already generated session summary if given"""
+    return render_session(
+        st.session_state.current_prompt,
+        st.session_state.journal_entry,
+        st.session_state.conversation_history,
+        summary
+    )
+
+def get_full_export():
+    """Return the full session export, rebuilt only when the conversation has changed"""
+    cached = st.session_state.export_cache
+    if cached is None or cached[0] != st.session_state.history_version:
+        cached = (st.session_state.history_version, generate_export_content(), create_filename())
+        st.session_state.export_cache = cached
+    return cached[1], cached[2]
+
+def render_trends():
+    """Show distortion and emotion trends from the precomputed daily aggregates, without any LLM calls"""
+    st.header("📈 Trends")
+    today = datetime.now().date()
+    trend_range = st.date_input("Show entries between:", value=(today - timedelta(days=30), today))
+    if len(trend_range) != 2:
+        return
+    trends = get_journal_store().trends(
+        datetime.combine(trend_range[0], time.min), datetime.combine(trend_range[1], time.max)
+    )
+    if not trends['distortions'] and not trends['emotions']:
+        st.info("Trends appear here once entries are analyzed with **Structured analysis** turned on in the sidebar.")
+        return
     
-    return content
+    totals = {}
+    for row in trends['distortions']:
+        totals[row['distortion']] = totals.get(row['distortion'], 0) + row['count']
+    st.subheader("Thinking patterns")
+    if totals:
+        st.bar_chart(
+            [{'pattern': name, 'entries': count} for name, count in sorted(totals.items(), key=lambda item: -item[1])],
+            x='pattern', y='entries', horizontal=True
+        )
+        st.caption("Over time")
+        st.bar_chart(trends['distortions'], x='day', y='count', color='distortion')
+    else:
+        st.caption("No cognitive distortions were identified in this period.")
+    
+    st.subheader("Emotions")
+    if trends['emotions']:
+        st.line_chart(trends['emotions'], x='day', y='intensity', color='emotion')
+    else:
+        st.caption("No emotions were recorded in this period.")
+    
+    themes = {}
+    for row in trends['themes']:
+        themes[row['theme']] = themes.get(row['theme'], 0) + row['count']
+    if themes:
+        st.subheader("Recurring themes")
+        st.write(", ".join(f"{theme} ({count})" for theme, count in sorted(themes.items(), key=lambda item: -item[1])[:15]))
 
 def create_filename():
     """Create a filename for the export"""
@@ -114,15 +453,17 @@ if not st.session_state.ollama_available:
 
 # Sidebar for session controls
 with st.sidebar:
+    st.session_state.view = st.radio("View", ("Journal", "Trends"), horizontal=True,
+                                     index=("Journal", "Trends").index(st.session_state.view))
     st.header("Session Controls")
     if st.button("New Journal Entry", type="primary"):
         reset_session()
         st.rerun()
     
     if st.button("Get New Prompt"):
+        # A new prompt starts a new stored session, so the next entry never lands in the old one
+        reset_session()
         st.session_state.current_prompt = get_new_prompt()
-        st.session_state.journal_entry = ""
-        st.session_state.analysis_complete = False
         st.rerun()
     # models = [model.model for model in ollama.list()["models"]] 
     # st.session_state["model"] = st.selectbox("Choose your model", models)
@@ -162,11 +503,36 @@ with st.sidebar:
             # Show current model info
             st.caption(f"Currently using: **{current_model}**")
             
+            st.session_state.stream_responses = st.checkbox(
+                "Stream responses",
+                value=st.session_state.stream_responses,
+                help="Show the AI's reply as it is written instead of waiting for the full response"
+            )
+            
+            st.session_state.structured_analysis = st.checkbox(
+                "Structured analysis",
+                value=st.session_state.structured_analysis,
+                help="Record emotions, thinking patterns and themes from each analysis for the Trends view (the analysis appears once complete instead of streaming)"
+            )
+            
+            st.session_state.precompute_summary = st.checkbox(
+                "Prepare summary in advance",
+                value=st.session_state.precompute_summary,
+                help="Generate the session summary in the background after each reply so exporting it is instant"
+            )
+            
+            cache_stats = get_response_cache().stats()
+            st.caption(f"Response cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
+            
             if selected_model != current_model:
+                # Start loading the model as soon as it is picked, before Switch is clicked
+                get_model_warmer().warm(selected_model)
+                if get_model_warmer().status(selected_model) == 'warming':
+                    st.caption(f"Loading {selected_model} in the background...")
                 if st.button("Switch Model", type="secondary"):
                     with st.spinner(f"Switching to {selected_model}..."):
                         try:
-                            new_analyzer = LLMAnalyzer(selected_model)
+                            new_analyzer = create_analyzer(selected_model)
                             st.session_state.llm_analyzer = new_analyzer
                             st.success(f"Switched to {selected_model}")
                             st.rerun()
@@ -175,6 +541,93 @@ with st.sidebar:
         else:
             st.warning("No models found in Ollama")
             st.caption("Pull a model with: `ollama pull llama3.2:1b`")
+        
+        if st.checkbox("Show diagnostics", help="Timing details reported by Ollama for recent AI calls"):
+            # Only the calls made for this browser session
+            recent_calls = get_metrics().recent(limit=10, session=st.session_state.client_key)
+            if recent_calls:
+                last = recent_calls[-1]
+                st.caption(f"Last call: {last['call_type']} on {last['model']}")
+                col1, col2 = st.columns(2)
+                col1.metric("Tokens/sec", f"{last['tokens_per_second']:.1f}")
+                col2.metric("Wall time", f"{last['wall_time']:.1f}s")
+                col1.metric("Cold load", f"{last['load_duration'] / 1e9:.1f}s")
+                col2.metric("Prompt tokens", last['prompt_eval_count'])
+                st.dataframe(
+                    [{
+                        'type': r['call_type'],
+                        'model': r['model'],
+                        'wall s': round(r['wall_time'], 2),
+                        'tok/s': round(r['tokens_per_second'], 1),
+                        'prompt': r['prompt_eval_count'],
+                        'cached': r.get('cache_hit', False),
+                    } for r in reversed(recent_calls)],
+                    hide_index=True
+                )
+            else:
+                st.caption("No AI calls yet.")
+            load = get_scheduler().status()
+            st.caption(f"Scheduler: {load['running']} running, {load['queued']} queued")
+            shared_client = get_shared_client()
+            if hasattr(shared_client, 'status'):
+                st.caption("Ollama hosts")
+                st.dataframe(shared_client.status(), hide_index=True)
+    st.divider()
+    st.subheader("Past Sessions")
+    recent_sessions = get_journal_store().recent_sessions(limit=10)
+    if recent_sessions:
+        for session in recent_sessions:
+            started = datetime.fromisoformat(session['created_at']).strftime("%Y-%m-%d %H:%M")
+            if st.button(f"{started} — {session['prompt'][:40]}...", key=f"session_{session['id']}"):
+                load_session(session)
+                st.rerun()
+    else:
+        st.caption("Your saved sessions will appear here.")
+    
+    if st.session_state.ollama_available:
+        with st.expander("Search Past Entries"):
+            search_query = st.text_input("Find reflections about:", placeholder="e.g. feeling judged at work")
+            if search_query.strip():
+                try:
+                    results = get_embedding_index().search(search_query, k=5)
+                except Exception as e:
+                    results = []
+                    st.caption(f"Search unavailable: {str(e)}")
+                for result in results:
+                    found = datetime.fromisoformat(result['created_at']).strftime("%Y-%m-%d") if result['created_at'] else ""
+                    label = "Entry" if result['type'] == 'user_entry' else "Analysis"
+                    if st.button(f"{found} — {label}: {result['snippet'][:60]}...",
+                                 key=f"search_{result['session_id']}_{result['type']}"):
+                        flush_journal()
+                        session = get_journal_store().session(result['session_id'])
+                        if session is not None:
+                            load_session(session)
+                            st.rerun()
+                if not results and get_embedding_index().status()['last_error']:
+                    st.caption("Entries can't be indexed yet - is the embedding model pulled?")
+    
+    with st.expander("Bulk Export"):
+        export_range = st.date_input("Sessions between:", value=(), help="Export every saved session in this date range")
+        if len(export_range) == 2 and st.button("Export Archive"):
+            # Streamed to an anonymous temporary file, deleted as soon as the download button has read it
+            with tempfile.TemporaryFile(suffix=".zip") as archive:
+                with st.spinner("Writing archive..."):
+                    flush_journal()
+                    count = export_archive(
+                        get_journal_store().iter_sessions_between(
+                            datetime.combine(export_range[0], time.min),
+                            datetime.combine(export_range[1], time.max)
+                        ),
+                        archive
+                    )
+                st.caption(f"{count} sessions exported")
+                archive.seek(0)
+                st.download_button(
+                    label="Download Archive",
+                    data=archive.read(),
+                    file_name=f"journal_sessions_{export_range[0]:%Y%m%d}_{export_range[1]:%Y%m%d}.zip",
+                    mime="application/zip"
+                )
     st.divider()
     st.write("**How it works:**")
     st.write("1. Reflect on the prompt")
@@ -186,6 +639,10 @@ with st.sidebar:
         st.write("3. Save your reflection")
         st.write("4. Set up Ollama for AI analysis")
 
+if st.session_state.view == "Trends":
+    render_trends()
+    st.stop()
+
 # Get initial prompt if none exists
 if st.session_state.current_prompt is None:
     st.session_state.current_prompt = get_new_prompt()
@@ -209,31 +666,15 @@ if not st.session_state.analysis_complete:
         if st.button("Submit Entry", disabled=len(journal_text.strip()) < 10):
             if len(journal_text.strip()) >= 10:
                 st.session_state.journal_entry = journal_text
-                st.session_state.conversation_history.append({
-                    'type': 'user_entry',
-                    'content': journal_text
-                })
+                model_name = st.session_state.llm_analyzer.model_name if st.session_state.llm_analyzer is not None else None
+                record_message('user_entry', journal_text, model_name)
                 
                 # Analyze the entry if Ollama is available
                 if st.session_state.ollama_available and st.session_state.llm_analyzer is not None:
-                    with st.spinner("Analyzing your entry..."):
-                        try:
-                            analysis = st.session_state.llm_analyzer.analyze_entry(journal_text)
-                            st.session_state.conversation_history.append({
-                                'type': 'analysis',
-                                'content': analysis
-                            })
-                        except Exception as e:
-                            st.error(f"Unable to analyze entry: {str(e)}")
-                            st.session_state.conversation_history.append({
-                                'type': 'analysis',
-                                'content': "Analysis unavailable - Ollama connection failed."
-                            })
+                    start_analysis_job(st.session_state.llm_analyzer, journal_text)
                 else:
-                    st.session_state.conversation_history.append({
-                        'type': 'analysis',
-                        'content': "Your reflection has been saved. To get AI analysis and insights, please set up Ollama as described above."
-                    })
+                    record_message('analysis', "Your reflection has been saved. To get AI analysis and insights, please set up Ollama as described above.\n\n"
+                                   + render_screen(screen(journal_text)), index=False)
                 
                 st.session_state.analysis_complete = True
                 st.rerun()
@@ -249,6 +690,10 @@ else:
 if st.session_state.analysis_complete and st.session_state.conversation_history:
     st.header("🤖 AI Analysis & Support")
     
+    if st.session_state.job_error:
+        st.error(st.session_state.job_error)
+        st.session_state.job_error = None
+    
     # Display conversation history
     for i, message in enumerate(st.session_state.conversation_history):
         if message['type'] == 'analysis':
@@ -264,6 +709,14 @@ if st.session_state.analysis_complete and st.session_state.conversation_history:
                 st.markdown("**You asked:**")
                 st.info(message['content'])
     
+    if st.session_state.pending_job is not None:
+        render_pending_reply()
+    elif st.session_state.retry_analysis and st.session_state.llm_analyzer is not None:
+        if st.button("Retry Analysis"):
+            st.session_state.retry_analysis = False
+            start_analysis_job(st.session_state.llm_analyzer, st.session_state.journal_entry)
+            st.rerun()
+    
     # Continue conversation section
     if st.session_state.ollama_available:
         st.subheader("Continue the Conversation")
@@ -277,34 +730,30 @@ if st.session_state.analysis_complete and st.session_state.conversation_history:
         
         col1, col2 = st.columns([1, 4])
         with col1:
-            if st.button("Send", disabled=len(user_question.strip()) < 3):
+            reply_pending = st.session_state.pending_job is not None
+            if st.button("Send", disabled=len(user_question.strip()) < 3 or reply_pending):
                 if len(user_question.strip()) >= 3:
-                    with st.spinner("Thinking..."):
-                        try:
-                            analyzer = st.session_state.llm_analyzer
-                            if analyzer is not None:
-                                response = analyzer.continue_conversation(
-                                    st.session_state.conversation_history, 
-                                    user_question
-                                )
-                            else:
-                                response = "Unable to continue conversation - Ollama not available."
-                            st.session_state.conversation_history.append({
-                                'type': 'user_question',
-                                'content': user_question
-                            })
-                            st.session_state.conversation_history.append({
-                                'type': 'ai_response',
-                                'content': response
-                            })
-                            st.rerun()
-                        except Exception as e:
-                            st.error(f"Unable to continue conversation: {str(e)}")
+                    analyzer = st.session_state.llm_analyzer
+                    if analyzer is None:
+                        record_message('user_question', user_question)
+                        record_message('ai_response', "Unable to continue conversation - Ollama not available.")
+                    else:
+                        converse = analyzer.continue_conversation_stream if st.session_state.stream_responses else analyzer.continue_conversation
+                        start_reply_job(
+                            'ai_response', converse,
+                            list(st.session_state.conversation_history), user_question,
+                            st.session_state.session_id,
+                            model=analyzer.model_name, question=user_question
+                        )
+                    st.rerun()
     else:
         st.info("💡 Interactive conversation will be available once Ollama is set up and running.")
 
 # Export functionality
 if st.session_state.analysis_complete and st.session_state.journal_entry:
+    if st.session_state.precompute_summary and st.session_state.ollama_available and st.session_state.llm_analyzer is not None:
+        update_speculative_summary()
+    
     st.header("📥 Export Your Session")
     
     col1, col2 = st.columns(2)
@@ -312,35 +761,59 @@ if st.session_state.analysis_complete and st.session_state.journal_entry:
     with col1:
         st.subheader("Full Export")
         st.write("Complete conversation with all AI analysis and dialogue")
-        full_content = generate_export_content(include_summary=False)
-        st.download_button(
-            label="Download Full Session",
-            data=full_content,
-            file_name=create_filename(),
-            mime="text/plain",
-            help="Export the complete journaling session including all conversation history"
-        )
+        export_cache = st.session_state.export_cache
+        if export_cache is not None and export_cache[0] == st.session_state.history_version:
+            full_content, full_filename = get_full_export()
+            st.download_button(
+                label="Download Full Session",
+                data=full_content,
+                file_name=full_filename,
+                mime="text/plain",
+                help="Export the complete journaling session including all conversation history"
+            )
+        elif st.button("Prepare Full Session", help="Build the export of the complete journaling session"):
+            get_full_export()
+            st.rerun()
     
     with col2:
         if st.session_state.ollama_available:
             st.subheader("Summary Export")
             st.write("Key insights and takeaways from your session")
             
-            if st.button("Generate & Download Summary"):
-                with st.spinner("Creating summary..."):
-                    try:
-                        summary_content = generate_export_content(include_summary=True)
-                        summary_filename = create_filename().replace(".txt", "_summary.txt")
-                        st.download_button(
-                            label="Download Summary",
-                            data=summary_content,
-                            file_name=summary_filename,
-                            mime="text/plain",
-                            help="Export a summarized version focusing on key insights and takeaways",
-                            key="summary_download"
-                        )
-                    except Exception as e:
-                        st.error(f"Failed to generate summary: {str(e)}")
+            if st.session_state.summary_job is not None:
+                render_summary_job()
+            elif st.session_state.summary_content is not None:
+                summary_filename = create_filename().replace(".txt", "_summary.txt")
+                st.download_button(
+                    label="Download Summary",
+                    data=st.session_state.summary_content,
+                    file_name=summary_filename,
+                    mime="text/plain",
+                    help="Export a summarized version focusing on key insights and takeaways",
+                    key="summary_download"
+                )
+            elif st.button("Generate & Download Summary"):
+                precomputed = ready_speculative_summary()
+                if precomputed is not None:
+                    st.session_state.summary_content = generate_export_content(summary=precomputed)
+                    st.rerun()
+                spec = st.session_state.speculative_summary
+                if spec is not None and spec['id'] is not None and spec['job_version'] == len(st.session_state.conversation_history):
+                    # The background summary already covers everything; wait for it without
+                    # queueing behind other sessions' background work
+                    get_job_queue().promote(spec['id'])
+                    st.session_state.summary_job = {'id': spec['id']}
+                    st.rerun()
+                analyzer = st.session_state.llm_analyzer
+                job = get_job_queue().submit(
+                    analyzer.summarize_session,
+                    st.session_state.current_prompt,
+                    st.session_state.journal_entry,
+                    list(st.session_state.conversation_history),
+                    kind='summary'
+                )
+                st.session_state.summary_job = {'id': job.id}
+                st.rerun()
         else:
             st.subheader("Summary Export")
             st.write("Summary requires Ollama to be running")
@@ -0,0 +1,227 @@
+"""
+Multi-host Ollama routing with health checks, sticky sessions and least-outstanding dispatch
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import httpx
+import ollama
+
+# Errors that mean the host itself is unreachable, as opposed to a bad request
+CONNECTION_ERRORS = (ConnectionError, httpx.TransportError)
+
+
+class Backend:
+    def __init__(self, host, probe_timeout=2.0, timeout=None):
+        """One Ollama host with its own client, health state and in-flight request count.
+
+        timeout (seconds, OLLAMA_REQUEST_TIMEOUT) bounds connecting and each read, so a hung
+        host fails over instead of holding the request forever.
+        """
+        self.host = host
+        self.client = ollama.Client(host=host, timeout=timeout or float(os.getenv("OLLAMA_REQUEST_TIMEOUT", "300")))
+        self.probe_client = ollama.Client(host=host, timeout=probe_timeout)
+        self.healthy = True
+        self.models = None
+        self.outstanding = 0
+
+    def __repr__(self):
+        return f"Backend({self.host!r}, healthy={self.healthy}, outstanding={self.outstanding})"
+
+
+class BackendPool:
+    def __init__(self, hosts, health_interval=None, max_sticky=None):
+        """Route Ollama calls across several hosts; exposes the subset of ollama.Client the app uses.
+
+        Session-to-host assignments are kept for the max_sticky most recently active sessions.
+        """
+        if not hosts:
+            raise ValueError("BackendPool needs at least one host")
+        self.backends = [Backend(host) for host in hosts]
+        self.health_interval = health_interval or float(os.getenv("OLLAMA_HEALTH_INTERVAL", "10"))
+        self.max_sticky = max_sticky or int(os.getenv("OLLAMA_STICKY_SESSIONS", "1024"))
+        self._sticky = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.probe()
+        threading.Thread(target=self._probe_loop, name="ollama-health", daemon=True).start()
+
+    @classmethod
+    def from_env(cls):
+        """Build a pool from the comma-separated OLLAMA_HOSTS variable"""
+        hosts = [host.strip() for host in os.getenv("OLLAMA_HOSTS", "").split(",") if host.strip()]
+        return cls(hosts)
+
+    def close(self):
+        self._stop.set()
+
+    def probe(self):
+        """Check every host once, recording whether it answers and which models it has"""
+        for backend in self.backends:
+            try:
+                models = {model.model for model in backend.probe_client.list()["models"]}
+                healthy = True
+            except Exception:
+                models, healthy = backend.models, False
+            with self._lock:
+                backend.healthy = healthy
+                backend.models = models
+
+    def _probe_loop(self):
+        while not self._stop.wait(self.health_interval):
+            self.probe()
+
+    def _candidates(self, model, exclude):
+        """Healthy hosts that have the model (or whose models are not known yet)"""
+        return [
+            backend for backend in self.backends
+            if backend.healthy and backend not in exclude
+            and (model is None or backend.models is None or model in backend.models)
+        ]
+
+    def _acquire(self, model, session_key=None, exclude=()):
+        """Pick a host: the session's previous host if still usable, else the least loaded one"""
+        with self._lock:
+            candidates = self._candidates(model, exclude)
+            if not candidates:
+                raise ConnectionError(f"No healthy Ollama host has model '{model}'")
+            backend = self._sticky.get(session_key)
+            if backend not in candidates:
+                backend = min(candidates, key=lambda b: b.outstanding)
+            if session_key is not None:
+                self._sticky[session_key] = backend
+                self._sticky.move_to_end(session_key)
+                if len(self._sticky) > self.max_sticky:
+                    self._sticky.popitem(last=False)
+            backend.outstanding += 1
+            return backend
+
+    def _release(self, backend, failed=False):
+        with self._lock:
+            backend.outstanding -= 1
+            if failed:
+                backend.healthy = False
+
+    def for_session(self, session_key):
+        """A client view that keeps one session on the same host so its KV cache stays warm"""
+        return SessionClient(self, session_key)
+
+    def _call(self, model, request, session_key=None):
+        """Run request(client) on a chosen host, failing over to another if it is unreachable"""
+        tried = []
+        while True:
+            backend = self._acquire(model, session_key, tried)
+            failed = False
+            try:
+                return request(backend.client)
+            except CONNECTION_ERRORS:
+                failed = True
+                tried.append(backend)
+            finally:
+                self._release(backend, failed=failed)
+
+    def chat(self, model, messages=None, stream=False, session_key=None, **kwargs):
+        """Route a chat request, failing over to another host if the chosen one is unreachable"""
+        if stream:
+            return self._chat_stream(model, messages, session_key, kwargs)
+        return self._call(model, lambda client: client.chat(model=model, messages=messages, **kwargs), session_key)
+
+    def _chat_stream(self, model, messages, session_key, kwargs):
+        """Streaming chat; fails over only until the first chunk has been received"""
+        tried = []
+        while True:
+            backend = self._acquire(model, session_key, tried)
+            failed = False
+            started = False
+            try:
+                for chunk in backend.client.chat(model=model, messages=messages, stream=True, **kwargs):
+                    started = True
+                    yield chunk
+                return
+            except CONNECTION_ERRORS:
+                failed = True
+                if started:
+                    raise
+                tried.append(backend)
+            finally:
+                self._release(backend, failed=failed)
+
+    def embed(self, model, input="", **kwargs):
+        """Route an embedding request to the least loaded host, failing over if it is unreachable"""
+        return self._call(model, lambda client: client.embed(model=model, input=input, **kwargs))
+
+    def show(self, model):
+        """Model details from a healthy host that has the model"""
+        return self._call(model, lambda client: client.show(model))
+
+    def generate(self, model, prompt="", **kwargs):
+        """Route a generate request; an empty prompt (load or unload) goes to every host with the model"""
+        if prompt:
+            return self._call(model, lambda client: client.generate(model=model, prompt=prompt, **kwargs))
+
+        response = None
+        with self._lock:
+            targets = self._candidates(model, ())
+        for backend in targets:
+            try:
+                response = backend.client.generate(model=model, prompt=prompt, **kwargs)
+            except CONNECTION_ERRORS:
+                with self._lock:
+                    backend.healthy = False
+        if response is None:
+            raise ConnectionError(f"No healthy Ollama host could load model '{model}'")
+        return response
+
+    def list(self):
+        """Models available on at least one healthy host"""
+        merged = {}
+        for backend in self.backends:
+            if not backend.healthy:
+                continue
+            try:
+                for model in backend.client.list()["models"]:
+                    merged.setdefault(model.model, model)
+            except CONNECTION_ERRORS:
+                with self._lock:
+                    backend.healthy = False
+        if not merged and not any(backend.healthy for backend in self.backends):
+            raise ConnectionError("No healthy Ollama hosts")
+        return ollama.ListResponse(models=list(merged.values()))
+
+    def ps(self):
+        """Models loaded on any healthy host"""
+        loaded = []
+        for backend in self.backends:
+            if not backend.healthy:
+                continue
+            try:
+                loaded.extend(backend.client.ps()["models"])
+            except CONNECTION_ERRORS:
+                with self._lock:
+                    backend.healthy = False
+        return ollama.ProcessResponse(models=loaded)
+
+    def status(self):
+        """Snapshot of each host's health, load and models"""
+        with self._lock:
+            return [{
+                'host': backend.host,
+                'healthy': backend.healthy,
+                'outstanding': backend.outstanding,
+                'models': sorted(backend.models or []),
+            } for backend in self.backends]
+
+
+class SessionClient:
+    def __init__(self, pool, session_key):
+        """Per-session view of a BackendPool with sticky routing"""
+        self.pool = pool
+        self.session_key = session_key
+
+    def chat(self, *args, **kwargs):
+        return self.pool.chat(*args, session_key=self.session_key, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.pool, name)
@@ -0,0 +1,162 @@
+"""
+Offline batch analysis of journal entries from JSONL/CSV files or a directory of text files
+
+Usage:
+    python batch_analyze.py entries.jsonl -o analyses.jsonl --concurrency 4
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
+from llm_analyzer import LLMAnalyzer
+from response_cache import ResponseCache
+
+TEXT_FIELDS = ('entry', 'journal_entry', 'text', 'content')
+
+
+def entry_id(text):
+    """Stable id for an entry without one, derived from its content"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _record(row, source):
+    """Normalise a JSON object or CSV row into an {'id', 'entry', 'source'} record"""
+    text = next((row[field] for field in TEXT_FIELDS if row.get(field)), None)
+    if not text or not text.strip():
+        return None
+    return {'id': str(row.get('id') or entry_id(text)), 'entry': text, 'source': source}
+
+
+def read_entries(path):
+    """Yield entry records from a .jsonl/.csv file or every supported file in a directory"""
+    path = Path(path)
+    if path.is_dir():
+        for child in sorted(path.iterdir()):
+            if child.suffix in ('.jsonl', '.csv'):
+                yield from read_entries(child)
+            elif child.suffix in ('.txt', '.md'):
+                text = child.read_text(encoding="utf-8")
+                if text.strip():
+                    yield {'id': child.stem, 'entry': text, 'source': str(child)}
+    elif path.suffix == '.csv':
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                record = _record(row, str(path))
+                if record is not None:
+                    yield record
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = _record(json.loads(line), str(path))
+                    if record is not None:
+                        yield record
+
+
+def completed_ids(output_path):
+    """Ids already present in the output file, used as the resume checkpoint"""
+    done = set()
+    if os.path.exists(output_path):
+        with open(output_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    # A run interrupted mid-write can leave a partial last line
+                    continue
+                if 'analysis' in result:
+                    done.add(result['id'])
+    return done
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def analyze_record(analyzer, record):
+    """Analyze one record and return its result with timing"""
+    started = time.perf_counter()
+    result = {'id': record['id'], 'source': record['source'], 'model': analyzer.model_name}
+    try:
+        result['analysis'] = analyzer.analyze_entry(record['entry'])
+    except Exception as e:
+        result['error'] = str(e)
+    result['latency'] = time.perf_counter() - started
+    return result
+
+
+def run(args):
+    """Analyze every pending entry with bounded concurrency and report throughput"""
+    cache = ResponseCache() if args.cache else None
+    analyzer = LLMAnalyzer(args.model, cache=cache)
+    done = completed_ids(args.output)
+    pending = (record for record in read_entries(args.input) if record['id'] not in done)
+
+    latencies = []
+    failures = 0
+    started = time.perf_counter()
+
+    with open(args.output, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        in_flight = set()
+        for record in pending:
+            in_flight.add(executor.submit(analyze_record, analyzer, record))
+            if len(in_flight) < args.concurrency * 2:
+                continue
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                failures += _write_result(future.result(), out, latencies)
+        for future in wait(in_flight).done:
+            failures += _write_result(future.result(), out, latencies)
+
+    elapsed = time.perf_counter() - started
+    processed = len(latencies)
+    print(f"Analyzed {processed - failures} entries ({failures} failed, {len(done)} skipped from checkpoint) "
+          f"in {elapsed:.1f}s with {analyzer.model_name}")
+    if processed:
+        print(f"Throughput: {processed / elapsed:.2f} entries/sec")
+        print(f"Latency: p50 {percentile(latencies, 50):.2f}s, p95 {percentile(latencies, 95):.2f}s")
+    return 1 if failures else 0
+
+
+def _write_result(result, out, latencies):
+    """Append a successful result to the output file immediately; returns 1 if it failed.
+
+    Failures go to stderr instead, so the output holds one line per id and the next run retries them.
+    """
+    latencies.append(result['latency'])
+    if 'error' in result:
+        print(f"Failed {result['id']} ({result['source']}): {result['error']}", file=sys.stderr)
+        return 1
+    out.write(json.dumps(result, ensure_ascii=False) + "\n")
+    out.flush()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze journal entries in bulk with a local Ollama model")
+    parser.add_argument("input", help="JSONL or CSV file of entries, or a directory of .txt/.md/.jsonl/.csv files")
+    parser.add_argument("-o", "--output", default="analyses.jsonl",
+                        help="JSONL file results are appended to; existing results are skipped on resume")
+    parser.add_argument("-m", "--model", default=None, help="Ollama model to use (defaults to OLLAMA_MODEL)")
+    parser.add_argument("-c", "--concurrency", type=int, default=int(os.getenv("OLLAMA_NUM_PARALLEL", "4")),
+                        help="Maximum concurrent requests; match the server's OLLAMA_NUM_PARALLEL")
+    parser.add_argument("--cache", action="store_true", help="Reuse and store responses in the response cache")
+    args = parser.parse_args(argv)
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+"""
+Stand-in Ollama HTTP server for benchmarks and local testing without a real model
+
+Implements /api/chat (blocking and streaming), /api/generate, /api/embed, /api/show, /api/tags
+and /api/ps with configurable per-token generation delay and prompt-eval cost. Prompt evaluation is charged
+only for the part of the prompt that differs from the previous request to the same model,
+mimicking Ollama's prompt (KV) cache.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Reply used when a request constrains the output with a JSON format
+STRUCTURED_REPLY = {
+    'emotions': [{'name': "overwhelmed", 'intensity': 7}, {'name': "guilt", 'intensity': 5}],
+    'distortions': [{'name': "mind reading", 'evidence': "everyone thinks I'm difficult"},
+                    {'name': "overgeneralization", 'evidence': "I always ruin things"}],
+    'themes': ["work stress", "self-criticism"],
+    'summary': "You are carrying frustration from a tense moment at work and some guilt about it.",
+    'reframing': ["One tense standup is a single moment, not a verdict on who you are."],
+    'questions': ["What would you say to a friend who had the same morning?"],
+}
+
+REPLY_WORDS = ("It sounds like today carried a lot of weight for you, and it makes sense "
+               "that you'd feel stretched thin. Let's look gently at the thoughts underneath.").split()
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _embedding(text, dim):
+    """Deterministic bag-of-words vector, so texts sharing words come out similar"""
+    vector = [0.0] * dim
+    for word in text.lower().split():
+        digest = hashlib.md5(word.strip(".,!?;:\"'").encode("utf-8")).digest()
+        vector[digest[0] % dim] += 1.0 if digest[1] % 2 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class FakeOllama:
+    def __init__(self, host="127.0.0.1", port=0, models=("gemma3",), token_delay=0.005,
+                 prompt_eval_delay=0.0002, load_delay=0.0, reply_tokens=60, parallel=None, embed_dim=64):
+        """Configure and bind the server; call start() to serve on a background thread.
+
+        parallel limits concurrent generations like OLLAMA_NUM_PARALLEL; extra requests queue.
+        """
+        self.models = list(models)
+        self.token_delay = token_delay
+        self.prompt_eval_delay = prompt_eval_delay
+        self.load_delay = load_delay
+        self.reply_tokens = reply_tokens
+        self.embed_dim = embed_dim
+        self.stats = {}
+        self._loaded = set()
+        self._last_prompt = {}
+        self._in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(parallel) if parallel else None
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {}
+            self.peak_in_flight = self._in_flight
+
+    def _count(self, path, request_bytes, prompt_tokens=0, evaluated_tokens=0):
+        """Record one request against its endpoint"""
+        with self._lock:
+            entry = self.stats.setdefault(path, {
+                'calls': 0, 'request_bytes': 0, 'prompt_tokens': 0, 'evaluated_tokens': 0
+            })
+            entry['calls'] += 1
+            entry['request_bytes'] += request_bytes
+            entry['prompt_tokens'] += prompt_tokens
+            entry['evaluated_tokens'] += evaluated_tokens
+
+    def _evaluate_prompt(self, model, prompt):
+        """Charge prompt evaluation for the uncached suffix and the first-load cost if cold"""
+        with self._lock:
+            previous = self._last_prompt.get(model, "")
+            shared = 0
+            for a, b in zip(previous, prompt):
+                if a != b:
+                    break
+                shared += 1
+            if prompt:
+                self._last_prompt[model] = prompt
+            cold = model not in self._loaded
+            self._loaded.add(model)
+
+        load_duration = self.load_delay if cold else 0.0
+        prompt_tokens = len(prompt) // 4 + 1
+        evaluated = (len(prompt) - shared) // 4 + 1
+        eval_duration = evaluated * self.prompt_eval_delay
+        time.sleep(load_duration + eval_duration)
+        return prompt_tokens, evaluated, load_duration, eval_duration
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, payload, status=200):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                return raw, (json.loads(raw) if raw else {})
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    fake._count("/api/tags", 0)
+                    self._send_json({'models': [{
+                        'name': name, 'model': name, 'modified_at': _now(), 'size': 0,
+                        'digest': "0" * 64, 'details': {'format': "gguf", 'family': "fake"}
+                    } for name in fake.models]})
+                elif self.path == "/api/ps":
+                    fake._count("/api/ps", 0)
+                    with fake._lock:
+                        loaded = sorted(fake._loaded)
+                    self._send_json({'models': [{'name': name, 'model': name, 'size': 0} for name in loaded]})
+                elif self.path == "/":
+                    self._send_json({'status': "Ollama is running"})
+                else:
+                    self._send_json({'error': "not found"}, 404)
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_POST(self):
+                raw, request = self._read_body()
+                if self.path == "/api/chat":
+                    prompt = "".join(f"{m.get('role')}:{m.get('content')}\n" for m in request.get('messages', []))
+                    self._generate(raw, request, prompt, "/api/chat")
+                elif self.path == "/api/generate":
+                    self._generate(raw, request, request.get('prompt', ""), "/api/generate")
+                elif self.path == "/api/embed":
+                    self._embed(raw, request)
+                elif self.path == "/api/show":
+                    fake._count("/api/show", len(raw))
+                    if request.get('model') in fake.models:
+                        self._send_json({
+                            'modelfile': "", 'parameters': "", 'template': "{{ .Prompt }}",
+                            'details': {'format': "gguf", 'family': "fake"},
+                            'model_info': {'general.architecture': "fake", 'fake.context_length': 8192},
+                        })
+                    else:
+                        self._send_json({'error': f"model '{request.get('model')}' not found"}, 404)
+                else:
+                    self._send_json({'error': "not found"}, 404)
+
+            def _generate(self, raw, request, prompt, path):
+                model = request.get('model')
+                if model not in fake.models:
+                    fake._count(path, len(raw))
+                    self._send_json({'error': f"model '{model}' not found"}, 404)
+                    return
+
+                if fake._slots is not None:
+                    fake._slots.acquire()
+                with fake._lock:
+                    fake._in_flight += 1
+                    fake.peak_in_flight = max(fake.peak_in_flight, fake._in_flight)
+                try:
+                    started = time.perf_counter()
+                    prompt_tokens, evaluated, load_duration, eval_duration = fake._evaluate_prompt(model, prompt)
+                    fake._count(path, len(raw), prompt_tokens, evaluated)
+                    # An empty generate request only loads (or, with keep_alive 0, unloads) the model
+                    if path == "/api/generate" and not prompt:
+                        tokens = []
+                        if request.get('keep_alive') in (0, "0", "0s"):
+                            with fake._lock:
+                                fake._loaded.discard(model)
+                    elif request.get('format'):
+                        tokens = json.dumps(STRUCTURED_REPLY).split(" ")
+                    else:
+                        tokens = [REPLY_WORDS[i % len(REPLY_WORDS)] for i in range(fake.reply_tokens)]
+                    stream = request.get('stream', True)
+                    key = 'message' if path == "/api/chat" else 'response'
+
+                    def piece(text):
+                        return {'role': "assistant", 'content': text} if key == 'message' else text
+
+                    final = {
+                        'model': model, 'created_at': _now(), key: piece(""), 'done': True, 'done_reason': "stop",
+                        'load_duration': int(load_duration * 1e9),
+                        'prompt_eval_count': prompt_tokens,
+                        'prompt_eval_duration': int(eval_duration * 1e9),
+                        'eval_count': len(tokens),
+                        'eval_duration': int(len(tokens) * fake.token_delay * 1e9),
+                    }
+
+                    if not stream:
+                        time.sleep(len(tokens) * fake.token_delay)
+                        final[key] = piece(" ".join(tokens))
+                        final['total_duration'] = int((time.perf_counter() - started) * 1e9)
+                        self._send_json(final)
+                        return
+
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    try:
+                        for index, token in enumerate(tokens):
+                            time.sleep(fake.token_delay)
+                            text = token if index == 0 else " " + token
+                            self._chunk({'model': model, 'created_at': _now(), key: piece(text), 'done': False})
+                        final['total_duration'] = int((time.perf_counter() - started) * 1e9)
+                        self._chunk(final)
+                        self.wfile.write(b"0\r\n\r\n")
+                    except (BrokenPipeError, ConnectionResetError):
+                        # The client stopped reading (a cancelled stream), as Ollama would see it
+                        self.close_connection = True
+                finally:
+                    with fake._lock:
+                        fake._in_flight -= 1
+                    if fake._slots is not None:
+                        fake._slots.release()
+
+            def _embed(self, raw, request):
+                model = request.get('model')
+                texts = request.get('input', "")
+                texts = [texts] if isinstance(texts, str) else texts
+                fake._count("/api/embed", len(raw), sum(len(t) // 4 + 1 for t in texts))
+                if model not in fake.models:
+                    self._send_json({'error': f"model '{model}' not found"}, 404)
+                    return
+                self._send_json({
+                    'model': model,
+                    'embeddings': [_embedding(text, fake.embed_dim) for text in texts],
+                })
+
+            def _chunk(self, payload):
+                data = json.dumps(payload).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a stand-in Ollama server")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--models", default="gemma3", help="Comma-separated model names to advertise")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds per generated token")
+    parser.add_argument("--prompt-eval-delay", type=float, default=0.0005, help="Seconds per uncached prompt token")
+    parser.add_argument("--load-delay", type=float, default=2.0, help="Seconds for the first load of each model")
+    parser.add_argument("--parallel", type=int, default=None, help="Concurrent generations before requests queue")
+    args = parser.parse_args(argv)
+    fake = FakeOllama(port=args.port, models=args.models.split(","), token_delay=args.token_delay,
+                      prompt_eval_delay=args.prompt_eval_delay, load_delay=args.load_delay, parallel=args.parallel)
+    print(f"Fake Ollama listening on {fake.url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Benchmark LLMAnalyzer and the export path against the stand-in Ollama server
+
+Usage:
+    python -m benchmarks.run_benchmarks -o bench_results.json
+    python -m benchmarks.run_benchmarks -o new.json --compare bench_results.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import ollama
+
+from backend_pool import BackendPool
+from benchmarks.fake_ollama import FakeOllama
+from exporter import render_session
+from llm_analyzer import LLMAnalyzer, ModelCatalog
+from scheduler import Scheduler
+
+ENTRY = ("Today I snapped at a coworker during the standup and now I'm sure everyone thinks I'm "
+         "difficult to work with. I always ruin things when I'm tired. ") * 4
+QUESTION = "How can I stop assuming everyone is judging me after one bad moment?"
+TURN_COUNTS = (1, 5, 10, 20, 50)
+
+
+def percentiles(samples):
+    """Summarise a list of durations in milliseconds"""
+    ordered = sorted(samples)
+
+    def pick(pct):
+        return ordered[max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))]
+
+    return {
+        'n': len(ordered),
+        'mean_ms': 1000 * sum(ordered) / len(ordered),
+        'p50_ms': 1000 * pick(50),
+        'p95_ms': 1000 * pick(95),
+        'max_ms': 1000 * ordered[-1],
+    }
+
+
+def new_analyzer(fake, shared_client=None):
+    """Build an analyzer against the fake server, optionally reusing a client and catalog"""
+    if shared_client is not None:
+        client, catalog = shared_client
+        return LLMAnalyzer(client=client, catalog=catalog)
+    return LLMAnalyzer(client=ollama.Client(host=fake.url))
+
+
+def bench_construction(fake, iterations):
+    """Per-session analyzer construction, cold (own client) versus shared client and catalog"""
+    results = {}
+    for label in ('per_session', 'shared'):
+        shared = None
+        if label == 'shared':
+            client = ollama.Client(host=fake.url)
+            shared = (client, ModelCatalog(client))
+        fake.reset_stats()
+        samples = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            new_analyzer(fake, shared)
+            samples.append(time.perf_counter() - started)
+        results[label] = {
+            **percentiles(samples),
+            'tags_calls_per_construction': fake.stats.get('/api/tags', {}).get('calls', 0) / iterations,
+        }
+    return results
+
+
+def bench_reruns(fake, analyzer, reruns):
+    """Ollama calls made while drawing the sidebar model dropdown on each rerun"""
+    fake.reset_stats()
+    started = time.perf_counter()
+    for _ in range(reruns):
+        analyzer.get_available_models()
+    elapsed = time.perf_counter() - started
+    calls = sum(entry['calls'] for entry in fake.stats.values())
+    return {'reruns': reruns, 'calls_per_rerun': calls / reruns, 'mean_ms': 1000 * elapsed / reruns}
+
+
+def bench_analysis(fake, analyzer, iterations):
+    """Blocking and streaming analyze_entry latency and time to first token"""
+    blocking = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        analyzer.analyze_entry(f"{ENTRY} ({i})")
+        blocking.append(time.perf_counter() - started)
+
+    first_token, total = [], []
+    for i in range(iterations):
+        started = time.perf_counter()
+        first = None
+        for _ in analyzer.analyze_entry_stream(f"{ENTRY} [{i}]"):
+            if first is None:
+                first = time.perf_counter() - started
+        first_token.append(first)
+        total.append(time.perf_counter() - started)
+
+    return {
+        'blocking': percentiles(blocking),
+        'streaming_total': percentiles(total),
+        'streaming_ttft': percentiles(first_token),
+    }
+
+
+def bench_conversation(fake, analyzer, max_turns):
+    """Follow-up cost as the conversation grows, measured at selected turn counts"""
+    history = [
+        {'type': 'user_entry', 'content': ENTRY},
+        {'type': 'analysis', 'content': analyzer.analyze_entry(ENTRY)},
+    ]
+    per_turn = {}
+    for turn in range(1, max_turns + 1):
+        question = f"{QUESTION} (turn {turn})"
+        fake.reset_stats()
+        started = time.perf_counter()
+        first = None
+        chunks = []
+        for chunk in analyzer.continue_conversation_stream(history, question):
+            if first is None:
+                first = time.perf_counter() - started
+            chunks.append(chunk)
+        elapsed = time.perf_counter() - started
+        chat = fake.stats.get('/api/chat', {})
+        if turn in TURN_COUNTS or turn == max_turns:
+            per_turn[str(turn)] = {
+                'latency_ms': 1000 * elapsed,
+                'ttft_ms': 1000 * (first or elapsed),
+                'chat_calls': chat.get('calls', 0),
+                'bytes_sent': chat.get('request_bytes', 0),
+                'prompt_tokens': chat.get('prompt_tokens', 0),
+                'evaluated_prompt_tokens': chat.get('evaluated_tokens', 0),
+            }
+        history.append({'type': 'user_question', 'content': question})
+        history.append({'type': 'ai_response', 'content': "".join(chunks)})
+    return per_turn, history
+
+
+def bench_export(fake, analyzer, history, iterations):
+    """Rendering the full export and generating the session summary"""
+    render = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        render_session("Prompt", ENTRY, history)
+        render.append(time.perf_counter() - started)
+
+    fake.reset_stats()
+    started = time.perf_counter()
+    analyzer.summarize_session("Prompt", ENTRY, history)
+    summary = time.perf_counter() - started
+    return {
+        'render': percentiles(render),
+        'history_items': len(history),
+        'summary_ms': 1000 * summary,
+        'summary_bytes_sent': fake.stats.get('/api/chat', {}).get('request_bytes', 0),
+    }
+
+
+def bench_routing(args, hosts=3, sessions=12, entries_per_session=3, parallel=2):
+    """Concurrent analyses through a BackendPool over several stand-in hosts versus one host"""
+    fakes = [FakeOllama(token_delay=args.token_delay, prompt_eval_delay=args.prompt_eval_delay,
+                        reply_tokens=args.reply_tokens, parallel=parallel).start() for _ in range(hosts)]
+    results = {}
+    try:
+        for label, urls in (('single_host', [fakes[0].url]), ('pooled', [fake.url for fake in fakes])):
+            pool = BackendPool(urls, health_interval=60)
+            for fake in fakes:
+                fake.reset_stats()
+
+            def session(index):
+                analyzer = LLMAnalyzer(client=pool.for_session(f"session-{index}"))
+                for entry in range(entries_per_session):
+                    analyzer.analyze_entry(f"{ENTRY} <{label} {index} {entry}>")
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=sessions) as executor:
+                list(executor.map(session, range(sessions)))
+            elapsed = time.perf_counter() - started
+            pool.close()
+            results[label] = {
+                'hosts': len(urls),
+                'elapsed_ms': 1000 * elapsed,
+                'entries_per_second': sessions * entries_per_session / elapsed,
+                'chat_calls_per_host': [fake.stats.get('/api/chat', {}).get('calls', 0) for fake in fakes[:len(urls)]],
+            }
+    finally:
+        for fake in fakes:
+            fake.stop()
+    return results
+
+
+def bench_long_entry(args, parallel=4, paragraphs=60, prompt_eval_delay=0.001):
+    """Analysis of a multi-thousand-word entry in one prompt versus map-reduce over parallel slots.
+
+    Uses a slower prompt-eval rate than the other benchmarks, since long prompts are where
+    prompt evaluation dominates on real hardware.
+    """
+    fake = FakeOllama(token_delay=args.token_delay, prompt_eval_delay=prompt_eval_delay,
+                      reply_tokens=args.reply_tokens, parallel=parallel).start()
+    entry = "\n\n".join(f"Day {day}. {ENTRY}" for day in range(paragraphs))
+    results = {'entry_tokens': len(entry) // 4}
+    try:
+        for label in ('single_prompt', 'map_reduce'):
+            # As in the app, the scheduler's limit sets how many chunks are read at once
+            analyzer = LLMAnalyzer(client=ollama.Client(host=fake.url), scheduler=Scheduler(max_concurrent=parallel))
+            if label == 'single_prompt':
+                analyzer.long_entry = {**analyzer.long_entry, 'threshold': float('inf')}
+            fake.reset_stats()
+            started = time.perf_counter()
+            analyzer.analyze_entry(f"{entry} <{label}>")
+            elapsed = time.perf_counter() - started
+            results[label] = {
+                'latency_ms': 1000 * elapsed,
+                'chat_calls': fake.stats.get('/api/chat', {}).get('calls', 0),
+                'peak_in_flight': fake.peak_in_flight,
+            }
+    finally:
+        fake.stop()
+    return results
+
+
+def run(args):
+    fake = FakeOllama(token_delay=args.token_delay, prompt_eval_delay=args.prompt_eval_delay,
+                      reply_tokens=args.reply_tokens).start()
+    try:
+        analyzer = new_analyzer(fake)
+        results = {
+            'construction': bench_construction(fake, args.iterations),
+            'reruns': bench_reruns(fake, analyzer, 100),
+            'analysis': bench_analysis(fake, analyzer, args.iterations),
+        }
+        results['conversation'], history = bench_conversation(fake, analyzer, args.max_turns)
+        results['export'] = bench_export(fake, analyzer, history, args.iterations)
+    finally:
+        fake.stop()
+    results['routing'] = bench_routing(args)
+    results['long_entry'] = bench_long_entry(args)
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'config': {
+            'iterations': args.iterations,
+            'max_turns': args.max_turns,
+            'token_delay': args.token_delay,
+            'prompt_eval_delay': args.prompt_eval_delay,
+            'reply_tokens': args.reply_tokens,
+        },
+        'results': results,
+    }
+
+
+def flatten(tree, prefix=""):
+    """Flatten nested results into dotted metric names"""
+    flat = {}
+    for key, value in tree.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(current, baseline):
+    """Print metrics that changed relative to a previous results file"""
+    now, before = flatten(current['results']), flatten(baseline['results'])
+    print(f"{'metric':60} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name in sorted(now):
+        if name in before and before[name]:
+            change = 100 * (now[name] - before[name]) / before[name]
+            print(f"{name:60} {before[name]:12.2f} {now[name]:12.2f} {change:+7.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analyzer against a fake Ollama server")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--max-turns", type=int, default=50)
+    parser.add_argument("--token-delay", type=float, default=0.002, help="Seconds per generated token")
+    parser.add_argument("--prompt-eval-delay", type=float, default=0.0001, help="Seconds per uncached prompt token")
+    parser.add_argument("--reply-tokens", type=int, default=60)
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report['results'], indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Token-budgeted context window management with a rolling summary of older turns
+"""
+
+import hashlib
+import os
+import re
+
+
+def estimate_tokens(text):
+    """Rough token estimate (about four characters per token plus message overhead)"""
+    return len(text) // 4 + 4
+
+
+def split_text(text, max_tokens):
+    """Split text into chunks of at most max_tokens, breaking between paragraphs, then sentences, then words"""
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append(("\n\n", paragraph))
+            continue
+        separator = "\n\n"
+        for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+            if estimate_tokens(sentence) <= max_tokens:
+                pieces.append((separator, sentence))
+            else:
+                words = sentence.split()
+                step = max(1, (max_tokens - 4) * 4 // 6)
+                for start in range(0, len(words), step):
+                    pieces.append((separator if start == 0 else " ", " ".join(words[start:start + step])))
+            separator = " "
+
+    chunks = []
+    current = ""
+    for separator, piece in pieces:
+        candidate = f"{current}{separator}{piece}" if current else piece
+        if current and estimate_tokens(candidate) > max_tokens:
+            chunks.append(current)
+            candidate = piece
+        current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def truncate_message(message, excess_tokens):
+    """Cut excess_tokens from the end of a message's content; returns (message, tokens still over)"""
+    content = message['content']
+    keep = max(len(content) - (excess_tokens + 8) * 4, 0)
+    truncated = content[:keep].rsplit(" ", 1)[0] + " [...]" if keep else "[...]"
+    saved = estimate_tokens(content) - estimate_tokens(truncated)
+    return {**message, 'content': truncated}, excess_tokens - saved
+
+
+class ContextManager:
+    def __init__(self, num_ctx=None, reply_tokens=1024, low_watermark=0.6):
+        """Keep conversation history within num_ctx tokens, leaving reply_tokens for the answer.
+
+        When the history no longer fits, older follow-up turns are folded into a rolling
+        summary until it drops below low_watermark of the budget, so the summary (and the
+        prompt prefix) only changes every few turns rather than on every one.
+        """
+        self.num_ctx = num_ctx or int(os.getenv("OLLAMA_NUM_CTX", "4096"))
+        self.reply_tokens = reply_tokens
+        self.low_watermark = low_watermark
+        self._conversation_key = None
+        self._summarized_upto = 0
+        self._summary = ""
+
+    @property
+    def budget(self):
+        """Tokens available for history and the new question"""
+        return max(self.num_ctx - self.reply_tokens, 0)
+
+    def _key(self, pinned):
+        """Identify a conversation by its pinned opening messages"""
+        digest = hashlib.sha256()
+        for message in pinned:
+            digest.update(message['content'].encode("utf-8"))
+        return digest.hexdigest()
+
+    def fit(self, conversation_history, user_question, summarize, overhead_tokens=0):
+        """Return a history that fits the budget, folding older turns via summarize(summary, turns).
+
+        The journal entry and its analysis are kept verbatim, followed by the rolling
+        summary (as a 'summary' item) and the most recent turns verbatim. The budget is a
+        hard ceiling: if the latest pair alone does not fit it is folded in too, and if the
+        pinned messages are still too long the analysis, then the entry, is truncated.
+        """
+        pinned_count = 0
+        while pinned_count < len(conversation_history) and \
+                conversation_history[pinned_count]['type'] in ('user_entry', 'analysis'):
+            pinned_count += 1
+        pinned = conversation_history[:pinned_count]
+        turns = conversation_history[pinned_count:]
+
+        key = self._key(pinned)
+        if key != self._conversation_key or self._summarized_upto > len(turns):
+            self._conversation_key = key
+            self._summarized_upto = 0
+            self._summary = ""
+
+        fixed = overhead_tokens + estimate_tokens(user_question) + \
+            sum(estimate_tokens(message['content']) for message in pinned)
+
+        def total(upto):
+            summary_tokens = estimate_tokens(self._summary) if self._summary else 0
+            return fixed + summary_tokens + sum(estimate_tokens(m['content']) for m in turns[upto:])
+
+        if total(self._summarized_upto) > self.budget:
+            target = self.budget * self.low_watermark
+            upto = self._summarized_upto
+            # Fold whole question/response pairs, always keeping the latest pair verbatim
+            while upto + 2 < len(turns) and total(upto) > target:
+                upto += 2
+            if upto > self._summarized_upto:
+                self._summary = summarize(self._summary, turns[self._summarized_upto:upto])
+                self._summarized_upto = upto
+        if total(self._summarized_upto) > self.budget and self._summarized_upto < len(turns):
+            self._summary = summarize(self._summary, turns[self._summarized_upto:])
+            self._summarized_upto = len(turns)
+
+        history = list(pinned)
+        excess = total(self._summarized_upto) - self.budget
+        for kind in ('analysis', 'user_entry'):
+            for i, message in enumerate(history):
+                if excess > 0 and message['type'] == kind:
+                    history[i], excess = truncate_message(message, excess)
+        if self._summary:
+            history.append({'type': 'summary', 'content': self._summary})
+        history.extend(turns[self._summarized_upto:])
+        return history
@@ -0,0 +1,133 @@
+"""
+Local cognitive-distortion pre-screen: a precompiled phrase lexicon matched in one regex pass
+"""
+
+import re
+
+from structured_analysis import DISTORTIONS
+
+# Phrases that commonly signal each distortion; a match means "possible", not a diagnosis
+LEXICON = {
+    "all-or-nothing thinking": [
+        r"complete(?:ly)? (?:failure|disaster|waste)", r"total(?:ly)? (?:failure|disaster|failed|ruined|useless)",
+        r"perfect or (?:nothing|worthless)", r"or nothing at all", r"ruined everything",
+        r"everything is (?:ruined|wrong|terrible|falling apart)", r"nothing (?:ever )?goes right",
+    ],
+    "overgeneralization": [
+        r"I (?:always|never) (?:mess|screw)(?:es|ed)? (?:\w+ )?up", r"I (?:always|never) let (?:\w+ )?down",
+        r"I (?:always|never) (?:get|do|say|make) (?:\w+ )?wrong", r"I (?:always|never) (?:ruin|fail at|mess up) (?:everything|anything)",
+        r"I never (?:get|do|say|make) anything right", r"I can never (?:do|get|seem)", r"I always end up", r"I never seem to",
+        r"(?:he|she|they|people|everyone|nobody|no ?one) (?:always|never) (?:ignores?|critici[sz]es?|blames? me|leaves? me out|lets? me down)",
+        r"(?:he|she|they|people|everyone|nobody|no ?one) (?:always|never|ever) (?:listens?|cares?|understands?|likes? me|wants? me|notices?)",
+        r"(?:this|it) always happens to me", r"(?:things|it) never works? out", r"every single time I",
+        r"nothing ever (?:works|goes right|changes)",
+    ],
+    "mental filter": [
+        r"all I (?:can|could) think about", r"can'?t stop thinking about", r"the only thing I (?:remember|noticed)",
+        r"that one (?:comment|mistake|thing) ruined",
+    ],
+    "disqualifying the positive": [
+        r"doesn'?t (?:really )?count", r"just (?:got )?lucky", r"anyone could have done",
+        r"(?:they|he|she) (?:was|were) just being nice", r"it was nothing special",
+        r"(?:only|just) (?:got|won|passed|succeeded|did well)\w* (?:\w+ )?because",
+    ],
+    "mind reading": [
+        r"(?:everyone|they|people|others|he|she) (?:probably |must |definitely |all )?(?:thinks?|thought|sees?|believes?) (?:I'?m|I am|that I|of me|me as)",
+        r"I (?:just )?know (?:they|he|she|everyone) (?:thinks?|hates?|is judging|are judging)",
+        r"(?:is|are|was|were) judging me", r"hates? me", r"talking about me behind",
+    ],
+    "fortune telling": [
+        r"I(?:'?ll| will) never (?:be|get|find|make|have|succeed|change|recover)",
+        r"(?:it'?s|this is) going to (?:go wrong|be a disaster|fail)", r"bound to fail",
+        r"going to fail", r"won'?t work out", r"nothing will (?:ever )?change", r"I know (?:it|this) will (?:go wrong|fail)",
+    ],
+    "catastrophizing": [
+        r"(?:I am|I'm|my life is|my life's|everything is|I'?ve made) (?:a |an )?(?:complete |total |absolute |utter )?(?:disaster|catastrophe)",
+        r"(?:it'?s|this is|it was|that was) (?:a |an )?(?:complete |total |absolute |utter )?catastrophe",
+        r"the worst (?:thing|day|person)", r"my life is over", r"end of the world",
+        r"can'?t (?:handle|cope with|bear) (?:it|this|anything)", r"unbearable", r"ruined my (?:life|career|chances)",
+    ],
+    "emotional reasoning": [
+        r"I feel (?:like )?(?:a |an )?(?:failure|fraud|burden|idiot), so", r"I feel (?:stupid|useless|worthless), (?:so|which means)",
+        r"(?:just )?because I feel (?:like )?(?:a |an )?(?:failure|fraud|burden|idiot|stupid|useless|worthless|unlovable|guilty),? (?:I am|I'm|I must be|it must be|it means)",
+        r"I feel it,? so it must be",
+    ],
+    "should statements": [
+        r"I (?:really )?(?:should|shouldn'?t|must|mustn'?t|ought to) have", r"I (?:really )?(?:should|shouldn'?t|ought to) be",
+        r"(?:they|he|she|people) (?:should|shouldn'?t) have",
+    ],
+    "labeling": [
+        r"I'?m (?:such )?(?:a |an )?(?:idiot|loser|failure|fraud|mess|disappointment|joke|burden|terrible person|bad person)",
+        r"I am (?:such )?(?:a |an )?(?:idiot|loser|failure|fraud|mess|disappointment|joke|burden|terrible person|bad person)",
+        r"(?:he|she|they)(?:'s| is| are|'re) (?:such )?(?:an? )?(?:idiot|jerk|loser|monster)",
+    ],
+    "personalization": [
+        r"(?:it'?s|it was|this is) (?:all )?my fault", r"because of me", r"I (?:caused|ruined) (?:it|this|the)",
+        r"I should have (?:stopped|prevented|known)", r"if only I had",
+    ],
+    "blaming": [
+        r"(?:it'?s|it was) (?:all )?(?:his|her|their|your) fault", r"(?:he|she|they) made me (?:feel|do|so)",
+        r"because of (?:him|her|them)", r"(?:he|she|they) ruined",
+    ],
+}
+
+# One alternation over every phrase; the named group that matched identifies the category.
+# The leading lookbehind rejects mid-word positions before any alternative is tried.
+_GROUPS = {f"d{i}": name for i, name in enumerate(DISTORTIONS)}
+_PATTERN = re.compile(
+    r"(?<![\w'])(?:" + "|".join(
+        rf"(?P<d{i}>(?:{'|'.join(LEXICON[name])})\b)" for i, name in enumerate(DISTORTIONS)
+    ) + ")",
+    re.IGNORECASE
+)
+
+# A self-reflection question per distortion for the offline fallback reply
+QUESTIONS = {
+    "all-or-nothing thinking": "Is there a middle ground between total success and total failure here?",
+    "overgeneralization": "Is it really always (or never)? Can you think of one exception?",
+    "mental filter": "What else happened that you might be filtering out?",
+    "disqualifying the positive": "What would it mean to let that good thing count?",
+    "mind reading": "What do you actually know about what they think, and what are you guessing?",
+    "fortune telling": "What evidence do you have for how this will turn out? What else could happen?",
+    "catastrophizing": "What is the most likely outcome, rather than the worst one?",
+    "emotional reasoning": "Feelings are real, but are they facts? What would the evidence say?",
+    "should statements": "What would change if you replaced 'should' with 'I'd prefer'?",
+    "labeling": "Would you describe a friend this way for the same mistake?",
+    "personalization": "What other factors, outside your control, played a part?",
+    "blaming": "What parts of this are within your power to change?",
+}
+
+
+def screen(text, max_evidence=2):
+    """Return the distortion categories whose phrases appear in text, most frequent first"""
+    findings = {}
+    for match in _PATTERN.finditer(text):
+        name = _GROUPS[match.lastgroup]
+        finding = findings.setdefault(name, {'name': name, 'count': 0, 'evidence': []})
+        finding['count'] += 1
+        phrase = match.group(0)
+        if len(finding['evidence']) < max_evidence and phrase.lower() not in (e.lower() for e in finding['evidence']):
+            finding['evidence'].append(phrase)
+    return sorted(findings.values(), key=lambda finding: -finding['count'])
+
+
+def screen_hint(findings):
+    """Prompt hint listing the pre-screen's findings so the model can confirm or dismiss them"""
+    if not findings:
+        return ""
+    flagged = "; ".join(
+        f"{finding['name']} ({', '.join(repr(phrase) for phrase in finding['evidence'])})" for finding in findings
+    )
+    return (f"A quick phrase check flagged possible: {flagged}. Confirm or dismiss these briefly "
+            f"rather than surveying every distortion, and keep the analysis focused and concise.")
+
+
+def render_screen(findings):
+    """Markdown summary of the pre-screen, used as the instant first pass and the offline fallback"""
+    if not findings:
+        return "No common thinking-pattern phrases stood out in this entry."
+    lines = []
+    for finding in findings:
+        phrases = ", ".join(f'"{phrase}"' for phrase in finding['evidence'])
+        lines.append(f"- *{finding['name'].capitalize()}* - {phrases}. {QUESTIONS[finding['name']]}")
+    return "A few phrases might point to these thinking patterns:\n" + "\n".join(lines)
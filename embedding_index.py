@@ -0,0 +1,217 @@
+"""
+Semantic search over journal entries and analyses with a memory-mapped embedding index
+"""
+
+import json
+import os
+import queue
+import re
+import threading
+
+import numpy as np
+
+# Message types worth finding again; follow-up chatter is left out of the index
+INDEXED_TYPES = ('user_entry', 'analysis')
+
+# Characters of each indexed message kept for result previews and related-entry context
+SNIPPET_CHARS = 300
+
+# Sentinel placed on the embedding queue to stop the writer thread
+_STOP = object()
+
+
+class EmbeddingIndex:
+    def __init__(self, client, path=None, model=None, batch_size=16, flush_interval=0.5):
+        """Open (or create) the index for one embedding model and start the background embedder.
+
+        Vectors are unit-normalised float32 rows appended to a raw .f32 file and read back
+        through a memory map, so adding an entry never rewrites the matrix. Row metadata
+        (session id, type, timestamp, snippet) lives in a parallel JSONL file.
+        """
+        self.client = client
+        self.model = model or os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+        base = path or os.getenv("EMBEDDING_INDEX_PATH", "journal_index")
+        slug = re.sub(r"[^A-Za-z0-9_.-]", "_", self.model)
+        self.vectors_path = f"{base}.{slug}.f32"
+        self.rows_path = f"{base}.{slug}.jsonl"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.last_error = None
+        self._dim = None
+        self._rows = []
+        self._rows_by_session = {}
+        self._indexed = set()
+        self._matrix = None
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._load()
+
+        self._writer = threading.Thread(target=self._write_loop, name="embedding-index-writer", daemon=True)
+        self._writer.start()
+
+    def _load(self):
+        """Read row metadata and work out the vector width from what is on disk.
+
+        A crash between the two appends can leave one file a row ahead of the other, so
+        both are cut back to the rows they have in common before anything is appended.
+        """
+        rows = []
+        if os.path.exists(self.rows_path):
+            with open(self.rows_path, encoding="utf-8") as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+        if rows:
+            self._dim = rows[0]['dim']
+        vector_bytes = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        count = min(len(rows), vector_bytes // (4 * self._dim)) if self._dim else 0
+
+        if vector_bytes > count * (self._dim or 0) * 4:
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(count * self._dim * 4 if self._dim else 0)
+        if len(rows) > count:
+            with open(self.rows_path, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(row) + "\n" for row in rows[:count])
+        for row in rows[:count]:
+            self._add_row(row)
+
+    def _add_row(self, row):
+        """Register one row's metadata; caller holds the lock or is still constructing"""
+        self._rows_by_session.setdefault(row['session_id'], []).append(len(self._rows))
+        self._indexed.add((row['session_id'], row['type']))
+        self._rows.append(row)
+
+    def _matrix_view(self):
+        """Memory-map the vectors, re-mapping only when rows have been appended since last time"""
+        with self._lock:
+            count = len(self._rows)
+            if not count:
+                return None, 0
+            if self._matrix is None or self._matrix.shape[0] != count:
+                self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(count, self._dim))
+            return self._matrix, count
+
+    def embed(self, texts):
+        """Embed a batch of texts in one Ollama call and return unit-length float32 rows"""
+        response = self.client.embed(model=self.model, input=list(texts))
+        vectors = np.asarray(response['embeddings'], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def add(self, session_id, message_type, content, created_at=None):
+        """Queue a message for embedding; only entries and analyses are indexed, each once"""
+        if message_type in INDEXED_TYPES and content and content.strip():
+            self._queue.put((session_id, message_type, content, created_at))
+
+    def backfill(self, sessions):
+        """Queue every indexable message from stored sessions that the index does not have yet.
+
+        Analyses stored without a model are placeholders (Ollama unavailable, failed or
+        cancelled) rather than real analyses, so they are left out.
+        """
+        for session in sessions:
+            for message in session['messages']:
+                if message['type'] == 'analysis' and not message.get('model'):
+                    continue
+                if (session['id'], message['type']) not in self._indexed:
+                    self.add(session['id'], message['type'], message['content'], message['created_at'])
+
+    def _write_loop(self):
+        """Drain queued messages and embed them in batches, appending the vectors to disk"""
+        running = True
+        while running:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            items = [item for item in batch if item is not _STOP]
+            running = len(items) == len(batch)
+            try:
+                seen = set()
+                fresh = []
+                for item in items:
+                    key = item[:2]
+                    if key not in self._indexed and key not in seen:
+                        seen.add(key)
+                        fresh.append(item)
+                if fresh:
+                    self._append(fresh, self.embed([item[2] for item in fresh]))
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _append(self, items, vectors):
+        """Append embedded rows to the vector and metadata files"""
+        with self._lock:
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(f"Embedding width changed from {self._dim} to {vectors.shape[1]}")
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self.rows_path, "a", encoding="utf-8") as f:
+                for session_id, message_type, content, created_at in items:
+                    row = {
+                        'session_id': session_id,
+                        'type': message_type,
+                        'created_at': created_at,
+                        'snippet': content[:SNIPPET_CHARS],
+                        'dim': self._dim,
+                    }
+                    f.write(json.dumps(row) + "\n")
+                    self._add_row(row)
+
+    def flush(self):
+        """Block until every queued message has been embedded"""
+        self._queue.join()
+
+    def close(self):
+        """Embed anything still queued and stop the writer thread"""
+        self._queue.put(_STOP)
+        self._writer.join()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def recent_vectors(self, n, message_type='user_entry'):
+        """Vectors of the n most recently indexed messages of one type, oldest first"""
+        matrix, count = self._matrix_view()
+        if matrix is None:
+            return np.empty((0, self._dim or 0), dtype=np.float32)
+        rows = []
+        for i in range(count - 1, -1, -1):
+            if len(rows) == n:
+                break
+            if self._rows[i]['type'] == message_type:
+                rows.append(i)
+        return np.asarray(matrix[sorted(rows)])
+
+    def search(self, query, k=5, exclude_session=None, min_score=None):
+        """Return up to k indexed messages most similar to query, best first, with cosine scores"""
+        matrix, count = self._matrix_view()
+        if matrix is None:
+            return []
+        scores = matrix @ self.embed([query])[0]
+        if exclude_session is not None:
+            scores[self._rows_by_session.get(exclude_session, [])] = -np.inf
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        results = []
+        for i in top:
+            score = float(scores[i])
+            if score == -np.inf or (min_score is not None and score < min_score):
+                break
+            results.append({**self._rows[i], 'score': score})
+        return results
+
+    def status(self):
+        """Row count, queued messages and the last embedding error, for diagnostics"""
+        return {'rows': len(self._rows), 'queued': self._queue.qsize(), 'last_error': self.last_error}
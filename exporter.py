@@ -0,0 +1,73 @@
+"""
+Plain-text rendering of journaling sessions for download and bulk archive export
+"""
+
+import io
+import zipfile
+from datetime import datetime
+
+
+def write_session(out, prompt, journal_entry, conversation_history, summary=None, timestamp=None):
+    """Write one session as plain text to a file-like object"""
+    timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    out.write("Journal Session Export\n")
+    out.write(f"Date: {timestamp}\n")
+    out.write("=" * 50 + "\n\n")
+
+    # Add the prompt
+    out.write(f"Journaling Prompt:\n{prompt}\n\n")
+
+    # Add the journal entry
+    out.write(f"Your Reflection:\n{journal_entry}\n\n")
+
+    if conversation_history:
+        out.write("Session Analysis & Conversation:\n")
+        out.write("-" * 30 + "\n\n")
+
+        for message in conversation_history:
+            if message['type'] == 'analysis':
+                out.write("AI Analysis:\n")
+                out.write(message['content'] + "\n\n")
+            elif message['type'] == 'user_question':
+                out.write("Your Question:\n")
+                out.write(message['content'] + "\n\n")
+            elif message['type'] == 'ai_response':
+                out.write("AI Response:\n")
+                out.write(message['content'] + "\n\n")
+
+    # Add summary if one was generated
+    if summary is not None:
+        out.write("\n" + "=" * 50 + "\n")
+        out.write("SESSION SUMMARY\n")
+        out.write("=" * 50 + "\n\n")
+        out.write(summary + "\n")
+
+
+def render_session(prompt, journal_entry, conversation_history, summary=None):
+    """Render one session to a string"""
+    buffer = io.StringIO()
+    write_session(buffer, prompt, journal_entry, conversation_history, summary)
+    return buffer.getvalue()
+
+
+def export_archive(sessions, path):
+    """Stream stored sessions into a zip archive, one text file per session.
+
+    path is a file path or a seekable binary file object. sessions may be any iterable
+    (such as JournalStore.iter_sessions_between), so only one session is held in memory
+    at a time. Returns the number of sessions written.
+    """
+    count = 0
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for session in sessions:
+            created = datetime.fromisoformat(session['created_at'])
+            entry = next((m['content'] for m in session['messages'] if m['type'] == 'user_entry'), "")
+            name = f"journal_session_{created.strftime('%Y%m%d_%H%M%S')}_{session['id'][:8]}.txt"
+            with archive.open(name, "w") as raw:
+                with io.TextIOWrapper(raw, encoding="utf-8") as out:
+                    write_session(
+                        out, session['prompt'], entry, session['messages'],
+                        timestamp=created.strftime("%Y-%m-%d %H:%M:%S")
+                    )
+            count += 1
+    return count
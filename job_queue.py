@@ -0,0 +1,116 @@
+"""
+Background job queue for LLM calls so the Streamlit script thread never blocks on generation
+"""
+
+import inspect
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    def __init__(self, kind=None):
+        """Handle for a queued LLM call; text accumulates as streamed chunks arrive"""
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = 'queued'
+        self.chunks = []
+        self.result = None
+        self.error = None
+        self.future = None
+        self.call = None
+        self._cancelled = threading.Event()
+
+    @property
+    def text(self):
+        """Text generated so far (the full reply once the job is done)"""
+        if self.result is not None:
+            return self.result
+        return "".join(self.chunks)
+
+    @property
+    def done(self):
+        """Whether the job has finished, failed or been cancelled"""
+        return self.status in ('done', 'failed', 'cancelled')
+
+    @property
+    def cancelled(self):
+        """Whether cancellation has been requested"""
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Request cancellation; a streaming job stops at its next chunk"""
+        self._cancelled.set()
+        if self.future is not None and self.future.cancel():
+            self.status = 'cancelled'
+
+
+class JobQueue:
+    def __init__(self, max_workers=None, background_workers=1):
+        """Run submitted jobs on a bounded thread pool, with a smaller pool for background work"""
+        self.max_workers = max_workers or int(os.getenv("LLM_JOB_WORKERS", "4"))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm-job")
+        self._background_executor = ThreadPoolExecutor(max_workers=background_workers, thread_name_prefix="llm-background")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, kind=None, background=False, **kwargs):
+        """Queue fn(*args, **kwargs) and return its Job; generator results are consumed chunk by chunk.
+
+        Background jobs (speculative work nobody is waiting on yet) run on their own small
+        pool so they never hold a worker an interactive request could use.
+        """
+        job = Job(kind)
+        job.call = (fn, args, kwargs)
+        with self._lock:
+            self._jobs[job.id] = job
+        executor = self._background_executor if background else self._executor
+        job.future = executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def promote(self, job_id):
+        """Move a still-queued background job onto the interactive pool, now that someone is waiting on it.
+
+        A job that has already started keeps running where it is.
+        """
+        job = self.get(job_id)
+        if job is not None and job.status == 'queued' and job.future is not None and job.future.cancel():
+            job.future = self._executor.submit(self._run, job, *job.call)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        """Execute a job on a worker thread, recording its progress and outcome"""
+        if job.cancelled:
+            job.status = 'cancelled'
+            return
+        job.status = 'running'
+        try:
+            result = fn(*args, **kwargs)
+            if inspect.isgenerator(result):
+                try:
+                    for chunk in result:
+                        if job.cancelled:
+                            break
+                        job.chunks.append(chunk)
+                finally:
+                    result.close()
+                result = "".join(job.chunks)
+            if job.cancelled:
+                job.status = 'cancelled'
+            else:
+                job.result = result
+                job.status = 'done'
+        except Exception as e:
+            job.error = e
+            job.status = 'failed'
+
+    def get(self, job_id):
+        """Look up a job by id"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pop(self, job_id):
+        """Forget a job once its result has been collected"""
+        with self._lock:
+            return self._jobs.pop(job_id, None)
@@ -0,0 +1,346 @@
+"""
+Persistent SQLite storage for journaling sessions, entries and AI conversation
+"""
+
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    prompt TEXT,
+    model TEXT
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL REFERENCES sessions(id),
+    created_at TEXT NOT NULL,
+    type TEXT NOT NULL,
+    content TEXT NOT NULL,
+    model TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_created_at ON sessions(created_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_prompt ON sessions(prompt);
+CREATE INDEX IF NOT EXISTS idx_sessions_model ON sessions(model);
+CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id, id);
+CREATE TABLE IF NOT EXISTS analyses (
+    session_id TEXT PRIMARY KEY REFERENCES sessions(id),
+    created_at TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entry_notes (
+    session_id TEXT PRIMARY KEY REFERENCES sessions(id),
+    notes TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS daily_distortions (
+    day TEXT NOT NULL,
+    distortion TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, distortion)
+);
+CREATE TABLE IF NOT EXISTS daily_emotions (
+    day TEXT NOT NULL,
+    emotion TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    intensity_total INTEGER NOT NULL,
+    PRIMARY KEY (day, emotion)
+);
+CREATE TABLE IF NOT EXISTS daily_themes (
+    day TEXT NOT NULL,
+    theme TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, theme)
+);
+"""
+
+# Take a session's stored analysis back out of the daily aggregates before it is replaced
+RETRACT_ANALYSIS = [
+    "UPDATE daily_distortions SET count = count - 1 WHERE (day, distortion) IN ("
+    "SELECT substr(a.created_at, 1, 10), json_extract(d.value, '$.name') "
+    "FROM analyses a, json_each(a.data, '$.distortions') d WHERE a.session_id = ?)",
+    "UPDATE daily_emotions SET count = count - 1, intensity_total = intensity_total - ("
+    "SELECT json_extract(e.value, '$.intensity') FROM analyses a, json_each(a.data, '$.emotions') e "
+    "WHERE a.session_id = ? AND substr(a.created_at, 1, 10) = daily_emotions.day "
+    "AND json_extract(e.value, '$.name') = daily_emotions.emotion) WHERE (day, emotion) IN ("
+    "SELECT substr(a.created_at, 1, 10), json_extract(e.value, '$.name') "
+    "FROM analyses a, json_each(a.data, '$.emotions') e WHERE a.session_id = ?)",
+    "UPDATE daily_themes SET count = count - 1 WHERE (day, theme) IN ("
+    "SELECT substr(a.created_at, 1, 10), t.value FROM analyses a, json_each(a.data, '$.themes') t "
+    "WHERE a.session_id = ?)",
+    "DELETE FROM daily_distortions WHERE count <= 0",
+    "DELETE FROM daily_emotions WHERE count <= 0",
+    "DELETE FROM daily_themes WHERE count <= 0",
+]
+
+# Sentinel placed on the write queue to stop the writer thread
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+
+class JournalWriteError(Exception):
+    def __init__(self, failures):
+        """Raised by flush() when queued writes could not be committed since the last flush"""
+        self.failures = failures
+        super().__init__(f"{len(failures)} journal write(s) could not be saved: {failures[-1][2]}")
+
+
+class JournalStore:
+    def __init__(self, path=None, batch_size=50, flush_interval=0.5):
+        """Open (or create) the journal database and start the background writer"""
+        self.path = path or os.getenv("JOURNAL_DB_PATH", "journal.db")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._read_lock = threading.Lock()
+        self._failures = []
+        self._failures_lock = threading.Lock()
+        self.failed_writes = 0
+        self.last_error = None
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+
+        self._reader = self._connect(check_same_thread=False)
+        self._writer = threading.Thread(target=self._write_loop, name="journal-store-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self, check_same_thread=True):
+        """Open a connection in WAL mode so reads never block on the writer"""
+        conn = sqlite3.connect(self.path, check_same_thread=check_same_thread)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _write_loop(self):
+        """Drain queued writes and commit them in batches on a dedicated connection"""
+        conn = self._connect()
+        running = True
+        while running:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            statements = [item for item in batch if item is not _STOP]
+            running = len(statements) == len(batch)
+            try:
+                with conn:
+                    for sql, params in statements:
+                        conn.execute(sql, params)
+            except sqlite3.Error as e:
+                # One bad statement rolls back the whole batch, so retry each on its own
+                logger.warning("Journal write batch of %d failed (%s); retrying one by one", len(statements), e)
+                self._write_each(conn, statements)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        conn.close()
+
+    def _write_each(self, conn, statements):
+        """Commit statements individually, recording the ones that still fail for flush() to report"""
+        for sql, params in statements:
+            try:
+                with conn:
+                    conn.execute(sql, params)
+            except sqlite3.Error as e:
+                logger.error("Journal write failed: %s (%s)", e, sql.split("(")[0].strip())
+                with self._failures_lock:
+                    self._failures.append((sql, params, str(e)))
+                    self.failed_writes += 1
+                    self.last_error = str(e)
+
+    def create_session(self, prompt, model=None):
+        """Queue a new session row and return its id immediately"""
+        session_id = uuid.uuid4().hex
+        self._queue.put((
+            "INSERT INTO sessions (id, created_at, prompt, model) VALUES (?, ?, ?, ?)",
+            (session_id, datetime.now().isoformat(), prompt, model)
+        ))
+        return session_id
+
+    def add_message(self, session_id, message_type, content, model=None):
+        """Queue a conversation message (entry, analysis, question or response) for a session"""
+        self._queue.put((
+            "INSERT INTO messages (session_id, created_at, type, content, model) VALUES (?, ?, ?, ?, ?)",
+            (session_id, datetime.now().isoformat(), message_type, content, model)
+        ))
+
+    def set_entry_notes(self, session_id, notes):
+        """Queue the chunk notes a long entry was analysed from, so follow-ups replay the same notes"""
+        self._queue.put((
+            "INSERT OR REPLACE INTO entry_notes (session_id, notes) VALUES (?, ?)",
+            (session_id, json.dumps(notes))
+        ))
+
+    def entry_notes(self, session_id):
+        """Chunk notes stored for a session's entry, or None"""
+        with self._read_lock:
+            row = self._reader.execute("SELECT notes FROM entry_notes WHERE session_id = ?", (session_id,)).fetchone()
+        return json.loads(row['notes']) if row else None
+
+    def add_analysis(self, session_id, data, created_at=None):
+        """Queue a structured analysis and fold it into the per-day trend aggregates.
+
+        The aggregates are updated in the same write batch, so the trends view only ever
+        reads a few small pre-summed tables. Re-analysing a session first takes its previous
+        analysis back out of the aggregates, so each session is counted once.
+        """
+        created_at = created_at or datetime.now().isoformat()
+        day = created_at[:10]
+        for sql in RETRACT_ANALYSIS:
+            self._queue.put((sql, (session_id,) * sql.count("?")))
+        self._queue.put((
+            "INSERT OR REPLACE INTO analyses (session_id, created_at, data) VALUES (?, ?, ?)",
+            (session_id, created_at, json.dumps(data))
+        ))
+        for distortion in data['distortions']:
+            self._queue.put((
+                "INSERT INTO daily_distortions (day, distortion, count) VALUES (?, ?, 1) "
+                "ON CONFLICT (day, distortion) DO UPDATE SET count = count + 1",
+                (day, distortion['name'])
+            ))
+        for emotion in data['emotions']:
+            self._queue.put((
+                "INSERT INTO daily_emotions (day, emotion, count, intensity_total) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT (day, emotion) DO UPDATE SET count = count + 1, "
+                "intensity_total = intensity_total + excluded.intensity_total",
+                (day, emotion['name'], emotion['intensity'])
+            ))
+        for theme in data['themes']:
+            self._queue.put((
+                "INSERT INTO daily_themes (day, theme, count) VALUES (?, ?, 1) "
+                "ON CONFLICT (day, theme) DO UPDATE SET count = count + 1",
+                (day, theme)
+            ))
+
+    def trends(self, start, end):
+        """Per-day distortion, emotion and theme aggregates for days within [start, end]"""
+        params = (start.isoformat()[:10], end.isoformat()[:10])
+        with self._read_lock:
+            return {
+                'distortions': [dict(row) for row in self._reader.execute(
+                    "SELECT day, distortion, count FROM daily_distortions "
+                    "WHERE day >= ? AND day <= ? ORDER BY day", params
+                )],
+                'emotions': [dict(row) for row in self._reader.execute(
+                    "SELECT day, emotion, count, CAST(intensity_total AS REAL) / count AS intensity "
+                    "FROM daily_emotions WHERE day >= ? AND day <= ? ORDER BY day", params
+                )],
+                'themes': [dict(row) for row in self._reader.execute(
+                    "SELECT day, theme, count FROM daily_themes WHERE day >= ? AND day <= ? ORDER BY day", params
+                )],
+            }
+
+    def flush(self):
+        """Block until every queued write has been committed.
+
+        Raises JournalWriteError if any write failed since the previous flush.
+        """
+        self._queue.join()
+        with self._failures_lock:
+            failures, self._failures = self._failures, []
+        if failures:
+            raise JournalWriteError(failures)
+
+    def close(self):
+        """Flush pending writes and stop the writer thread"""
+        self._queue.put(_STOP)
+        self._writer.join()
+        self._reader.close()
+
+    def _load_sessions(self, where, params):
+        """Fetch sessions matching a WHERE clause together with their messages"""
+        with self._read_lock:
+            sessions = [dict(row) for row in self._reader.execute(
+                f"SELECT id, created_at, prompt, model FROM sessions {where}", params
+            )]
+            if not sessions:
+                return []
+
+            by_id = {session['id']: session for session in sessions}
+            for session in sessions:
+                session['messages'] = []
+
+            rows = self._reader.execute(
+                f"SELECT session_id, created_at, type, content, model FROM messages "
+                f"WHERE session_id IN (SELECT id FROM sessions {where}) ORDER BY session_id, id",
+                params
+            )
+            for row in rows:
+                by_id[row['session_id']]['messages'].append({
+                    'type': row['type'],
+                    'content': row['content'],
+                    'created_at': row['created_at'],
+                    'model': row['model'],
+                })
+        return sessions
+
+    def recent_sessions(self, limit=10):
+        """Return the most recent sessions, newest first"""
+        return self._load_sessions("ORDER BY created_at DESC LIMIT ?", (limit,))
+
+    def session(self, session_id):
+        """Return one session with its messages, or None if it does not exist"""
+        sessions = self._load_sessions("WHERE id = ?", (session_id,))
+        return sessions[0] if sessions else None
+
+    def sessions_between(self, start, end):
+        """Return sessions created within [start, end], oldest first"""
+        return self._load_sessions(
+            "WHERE created_at >= ? AND created_at <= ? ORDER BY created_at",
+            (start.isoformat(), end.isoformat())
+        )
+
+    def iter_sessions_between(self, start, end):
+        """Yield sessions created within [start, end] one at a time, oldest first.
+
+        Uses its own connection and a single streaming cursor, so bulk exports over
+        thousands of sessions never hold more than one session in memory.
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT s.id, s.created_at, s.prompt, s.model, m.type, m.content, "
+                "m.created_at AS message_created_at, m.model AS message_model "
+                "FROM sessions s LEFT JOIN messages m ON m.session_id = s.id "
+                "WHERE s.created_at >= ? AND s.created_at <= ? ORDER BY s.created_at, s.id, m.id",
+                (start.isoformat(), end.isoformat())
+            )
+            session = None
+            for row in rows:
+                if session is None or session['id'] != row['id']:
+                    if session is not None:
+                        yield session
+                    session = {
+                        'id': row['id'],
+                        'created_at': row['created_at'],
+                        'prompt': row['prompt'],
+                        'model': row['model'],
+                        'messages': [],
+                    }
+                if row['type'] is not None:
+                    session['messages'].append({
+                        'type': row['type'],
+                        'content': row['content'],
+                        'created_at': row['message_created_at'],
+                        'model': row['message_model'],
+                    })
+            if session is not None:
+                yield session
+        finally:
+            conn.close()
@@ -2,43 +2,238 @@
 LLM Analyzer for emotional content analysis and cognitive distortion identification
 """
 
+import hashlib
 import json
+import math
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from contextlib import nullcontext
 import ollama
+from backend_pool import BackendPool
+from response_cache import request_key
+from metrics import call_record
+from context_manager import ContextManager, estimate_tokens, split_text
+from model_warmer import ModelWarmer
+from scheduler import SchedulerBusy
+from structured_analysis import ANALYSIS_SCHEMA, STRUCTURED_INSTRUCTIONS, parse_analysis
+from distortion_screen import screen, screen_hint
+
+# Sampling options shared by every chat request
+DEFAULT_OPTIONS = {
+    'temperature': 0.7,
+    'top_p': 0.9,
+}
+
+# Similar past entries added to a follow-up (opt-in: the index holds every stored session,
+# so only enable it for a single-user store), and how close they must be to count
+RELATED_ENTRIES = int(os.getenv("RELATED_ENTRIES", "0"))
+RELATED_MIN_SCORE = float(os.getenv("RELATED_MIN_SCORE", "0.5"))
+
+# How long Ollama keeps the model (and its prompt cache) loaded between requests
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+def long_entry_settings(model_name, num_ctx):
+    """Token threshold and chunk size for map-reduce analysis of long entries with a model.
+
+    Defaults scale with the context window; LONG_ENTRY_TOKENS and LONG_ENTRY_CHUNK_TOKENS
+    override them for every model, and LONG_ENTRY_MODELS (JSON such as
+    '{"llama3": {"threshold": 3000, "chunk_tokens": 1500}}') per model or model family.
+    """
+    settings = {
+        'threshold': int(os.getenv("LONG_ENTRY_TOKENS", num_ctx // 2)),
+        'chunk_tokens': int(os.getenv("LONG_ENTRY_CHUNK_TOKENS", num_ctx // 4)),
+    }
+    per_model = json.loads(os.getenv("LONG_ENTRY_MODELS", "{}"))
+    settings.update(per_model.get(model_name) or per_model.get(model_name.split(":")[0]) or {})
+    return settings
+
+# How many long entries keep their chunk notes in memory
+ENTRY_NOTES_MEMO = 32
+
+_shared_client = None
+_shared_catalog = None
+_shared_warmer = None
+_shared_lock = threading.Lock()
+
+# Chunk notes of long entries by (model, entry digest), shared so every analyzer replays the same notes
+_entry_notes = OrderedDict()
+_entry_notes_lock = threading.Lock()
+
+
+def get_shared_client():
+    """Return the process-wide Ollama client so every session reuses one HTTP connection pool.
+
+    When OLLAMA_HOSTS lists several hosts this is a BackendPool routing across all of them.
+    """
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = BackendPool.from_env() if os.getenv("OLLAMA_HOSTS") else ollama.Client()
+        return _shared_client
+
+
+def get_model_catalog():
+    """Return the process-wide model catalog backed by the shared client"""
+    global _shared_catalog
+    client = get_shared_client()
+    with _shared_lock:
+        if _shared_catalog is None:
+            _shared_catalog = ModelCatalog(client)
+        return _shared_catalog
+
+
+def resolve_model(model_name, available_models):
+    """The model to use: model_name if installed, else a common model, else the first installed one"""
+    if model_name in available_models:
+        return model_name
+    # Try common model names
+    for common_model in ['llama3', 'deepseek', 'gemma3', 'llama2:7b']:
+        if common_model in available_models:
+            return common_model
+    if available_models:
+        return available_models[0]
+    raise Exception("No models available in Ollama")
+
+
+def get_model_warmer():
+    """Return the process-wide model warmer; the default model (as resolved) is never unloaded by it"""
+    global _shared_warmer
+    client = get_shared_client()
+    catalog = get_model_catalog()
+    with _shared_lock:
+        if _shared_warmer is None:
+            default_model = os.getenv("OLLAMA_MODEL", "gemma3")
+            try:
+                default_model = resolve_model(default_model, catalog.models())
+            except Exception:
+                pass
+            _shared_warmer = ModelWarmer(client, KEEP_ALIVE, pinned=[default_model])
+        return _shared_warmer
+
+
+class ModelCatalog:
+    def __init__(self, client, ttl=None):
+        """Cache the list of installed Ollama models, refreshing it in the background once stale"""
+        self.client = client
+        self.ttl = ttl if ttl is not None else float(os.getenv("OLLAMA_MODELS_TTL", "60"))
+        self._models = None
+        self._fetched_at = 0.0
+        self._refreshing = False
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def _fetch(self):
+        """Query Ollama for installed models and store the result"""
+        models = [model.model for model in self.client.list()["models"]]
+        with self._lock:
+            self._models = models
+            self._fetched_at = time.monotonic()
+        return models
+
+    def _refresh_in_background(self):
+        """Refresh the catalog, keeping the previous list if Ollama can't be reached"""
+        try:
+            self._fetch()
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def models(self):
+        """Return installed models; only the very first call waits on Ollama"""
+        with self._lock:
+            models = self._models
+            stale = time.monotonic() - self._fetched_at > self.ttl
+            if models is not None and stale and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh_in_background, daemon=True).start()
+        if models is None:
+            models = self._fetch()
+        return list(models)
+
+    def context_window(self, model):
+        """Context window Ollama gives model when a request leaves num_ctx unset.
+
+        That is the num_ctx parameter from the model's Modelfile if it sets one, otherwise
+        the server default (OLLAMA_CONTEXT_LENGTH, 4096 as in Ollama), capped at the length
+        the model supports. Looked up once per model with /api/show.
+        """
+        with self._lock:
+            if model in self._windows:
+                return self._windows[model]
+        window = int(os.getenv("OLLAMA_CONTEXT_LENGTH", "4096"))
+        try:
+            details = self.client.show(model)
+            for line in (details.parameters or "").splitlines():
+                name, _, value = line.strip().partition(" ")
+                if name == "num_ctx" and value.strip().isdigit():
+                    window = int(value.strip())
+            trained = [value for key, value in (details.modelinfo or {}).items() if key.endswith(".context_length")]
+            if trained:
+                window = min(window, int(trained[0]))
+        except Exception:
+            # Unknown this time; use the server default without remembering it
+            return window
+        with self._lock:
+            self._windows[model] = window
+        return window
+
 
 class LLMAnalyzer:
-    def __init__(self, model_name=None):
-        """Initialize the LLM analyzer with Ollama"""
+    def __init__(self, model_name=None, cache=None, client=None, catalog=None, native_chat=None, num_ctx=None,
+                 metrics=None, scheduler=None, user=None, priority=None, single_flight=None, index=None,
+                 screen_hints=None):
+        """Initialize the LLM analyzer with Ollama.
+
+        Optional collaborators: a ResponseCache, a MetricsRecorder, a Scheduler that admits
+        calls on behalf of user, a SingleFlight that merges identical concurrent requests and
+        an EmbeddingIndex that supplies similar past entries to follow-ups. priority overrides
+        the per-call-type priority class (e.g. 'batch'). screen_hints adds the local
+        distortion pre-screen's findings to the analysis prompt.
+        """
         self.model_name = model_name or os.getenv("OLLAMA_MODEL", "gemma3")
         self.client = None
+        self.cache = cache
+        self.metrics = metrics
+        self.scheduler = scheduler
+        self.user = user
+        self.priority = priority
+        self.single_flight = single_flight
+        self.index = index
+        if native_chat is None:
+            native_chat = os.getenv("OLLAMA_NATIVE_CHAT", "true").lower() == "true"
+        self.native_chat = native_chat
+        if screen_hints is None:
+            screen_hints = os.getenv("DISTORTION_HINTS", "true").lower() == "true"
+        self.screen_hints = screen_hints
+        if num_ctx is None and os.getenv("OLLAMA_NUM_CTX"):
+            num_ctx = int(os.getenv("OLLAMA_NUM_CTX"))
         
         if ollama is None:
             raise ImportError("Ollama package not available. Please install with: pip install ollama")
         
         # Test connection
         try:
-            self.client = ollama.Client()
+            self.client = client or get_shared_client()
+            self.catalog = catalog or (get_model_catalog() if client is None else ModelCatalog(client))
             # Test if model is available
-            models = self.client.list()
-            available_models = [model.model for model in ollama.list()["models"]] 
-            
-            if self.model_name not in available_models:
-                # Try common model names
-                for common_model in ['llama3', 'deepseek', 'gemma3', 'llama2:7b']:
-                    if common_model in available_models:
-                        self.model_name = common_model
-                        break
-                else:
-                    if available_models:
-                        self.model_name = available_models[0]
-                    else:
-                        raise Exception("No models available in Ollama")
+            available_models = self.catalog.models()
+            self.model_name = resolve_model(self.model_name, available_models)
                         
         except Exception as e:
             raise Exception(f"Failed to connect to Ollama: {str(e)}. Please ensure Ollama is running and has models installed.")
 
-    def analyze_entry(self, journal_entry):
-        """Analyze journal entry for emotional content and cognitive distortions"""
+        # num_ctx is only sent when set explicitly; otherwise the model's own window is budgeted for
+        self.context = ContextManager(num_ctx or self.catalog.context_window(self.model_name))
+        self.options = {**DEFAULT_OPTIONS, 'num_ctx': num_ctx} if num_ctx else dict(DEFAULT_OPTIONS)
+        self.long_entry = long_entry_settings(self.model_name, self.context.num_ctx)
+
+    def _analysis_messages(self, journal_entry):
+        """Build the chat messages for an initial journal entry analysis"""
         
         system_prompt = """You are a compassionate AI assistant trained in cognitive behavioral therapy principles. Your role is to help users identify emotional patterns and cognitive distortions in their journal entries, then provide supportive guidance.
 
@@ -48,7 +243,9 @@ When analyzing a journal entry, provide:
 3. **Reframing Suggestions**: Gentle, realistic alternative perspectives
 4. **Supportive Questions**: Questions that encourage self-reflection
 
-Be warm, non-judgmental, and focus on growth rather than criticism. Use a supportive tone throughout."""
+Be warm, non-judgmental, and focus on growth rather than criticism. Use a supportive tone throughout.
+
+If the user follows up with questions or wants to explore something deeper, build on what you've already discussed while addressing their new question directly, and keep encouraging self-reflection."""
 
         user_prompt = f"""Please analyze this journal entry:
 
@@ -56,26 +253,169 @@ Be warm, non-judgmental, and focus on growth rather than criticism. Use a suppor
 
 Provide a thoughtful analysis following the format requested. Focus on being helpful and supportive rather than clinical or detached."""
 
+        hint = screen_hint(screen(journal_entry)) if self.screen_hints else ""
+        if hint:
+            user_prompt += f"\n\n{hint}"
+
+        return [
+            {'role': 'system', 'content': system_prompt},
+            {'role': 'user', 'content': user_prompt}
+        ]
+
+    def _map_parallelism(self):
+        """How many chunks of a long entry to analyse at once.
+
+        Without a scheduler to bound the total, chunks are read one at a time so callers
+        that already run entries concurrently (such as batch_analyze) stay within their limit.
+        """
+        if os.getenv("LONG_ENTRY_PARALLEL"):
+            return int(os.getenv("LONG_ENTRY_PARALLEL"))
+        return self.scheduler.max_concurrent if self.scheduler is not None else 1
+
+    def _notes_key(self, journal_entry):
+        """Memo key for the chunk notes of an entry"""
+        return self.model_name, hashlib.sha256(journal_entry.encode("utf-8")).hexdigest()
+
+    def entry_notes(self, journal_entry):
+        """Chunk notes already taken for a long entry, or None; store them with the entry to replay it later"""
+        with _entry_notes_lock:
+            return _entry_notes.get(self._notes_key(journal_entry))
+
+    def _chunk_notes(self, journal_entry, notes=None):
+        """Analyse each chunk of a long entry concurrently and return the notes in order.
+
+        Notes are remembered per model and entry, and notes passed in (kept with the
+        conversation) are reused as they are, so follow-ups replay exactly the notes the
+        analysis was built from.
+        """
+        key = self._notes_key(journal_entry)
+        with _entry_notes_lock:
+            if notes is not None:
+                _entry_notes[key] = notes
+            notes = _entry_notes.get(key)
+            if notes is not None:
+                _entry_notes.move_to_end(key)
+                return notes
+
+        # Size chunks so they fill whole waves of parallel calls instead of leaving a straggler
+        parallel = self._map_parallelism()
+        tokens = estimate_tokens(journal_entry)
+        waves = math.ceil(tokens / (self.long_entry['chunk_tokens'] * parallel))
+        chunks = split_text(journal_entry, min(self.long_entry['chunk_tokens'], math.ceil(tokens / (waves * parallel)) + 64))
+
+        def note(index):
+            return self._chat([
+                {'role': 'system', 'content': "You take brief, factual notes on journal entries for a later supportive CBT-informed analysis."},
+                {'role': 'user', 'content': f"""This is part {index + 1} of {len(chunks)} of a long journal entry:
+
+"{chunks[index]}"
+
+In under 150 words of bullet points, note the emotions expressed, any cognitive distortions (quote the phrase), and the key events or themes."""}
+            ], 'analysis_chunk')
+
+        if parallel > 1:
+            with ThreadPoolExecutor(max_workers=min(parallel, len(chunks))) as executor:
+                notes = list(executor.map(note, range(len(chunks))))
+        else:
+            notes = [note(index) for index in range(len(chunks))]
+        with _entry_notes_lock:
+            # Keep the notes of whichever call finished first, so every caller sees the same ones
+            notes = _entry_notes.setdefault(key, notes)
+            _entry_notes.move_to_end(key)
+            while len(_entry_notes) > ENTRY_NOTES_MEMO:
+                _entry_notes.popitem(last=False)
+        return notes
+
+    def _entry_messages(self, journal_entry, notes=None):
+        """Analysis messages for an entry; long entries are read in chunks and analysed from the chunk notes"""
+        if estimate_tokens(journal_entry) <= self.long_entry['threshold']:
+            return self._analysis_messages(journal_entry)
+
+        notes = self._chunk_notes(journal_entry, notes)
+        messages = self._analysis_messages("")
+        opening = " ".join(journal_entry[:600].split()[:-1])
+        parts = "\n\n".join(f"Part {index + 1}:\n{note}" for index, note in enumerate(notes))
+        messages[-1] = {'role': 'user', 'content': f"""Please analyze this journal entry. It is long, so it was read in {len(notes)} parts; it begins:
+
+"{opening}..."
+
+Notes on each part:
+
+{parts}
+
+Provide a thoughtful analysis of the whole entry following the format requested. Focus on being helpful and supportive rather than clinical or detached."""}
+        return messages
+
+    def _related_context(self, user_question, session_id=None):
+        """Short excerpts of similar earlier entries for a follow-up, or "" if there are none.
+
+        Related context is a nice-to-have, so an unavailable embedding model never fails the reply.
+        """
+        if self.index is None or not RELATED_ENTRIES:
+            return ""
         try:
-            response = self.client.chat(
-                model=self.model_name,
-                messages=[
-                    {'role': 'system', 'content': system_prompt},
-                    {'role': 'user', 'content': user_prompt}
-                ],
-                options={
-                    'temperature': 0.7,
-                    'top_p': 0.9,
-                }
-            )
-            
-            return response['message']['content']
-            
-        except Exception as e:
-            raise Exception(f"Error analyzing entry with Ollama: {str(e)}")
+            related = self.index.search(user_question, RELATED_ENTRIES, exclude_session=session_id,
+                                        min_score=RELATED_MIN_SCORE)
+        except Exception:
+            return ""
+        if not related:
+            return ""
+        lines = []
+        for result in related:
+            label = "Entry" if result['type'] == 'user_entry' else "Analysis"
+            date = (result['created_at'] or "")[:10]
+            lines.append(f"- {label} from {date}: {result['snippet']}")
+        return ("For context, excerpts from the user's earlier journaling sessions that may be related "
+                "(refer to them only if helpful):\n" + "\n".join(lines) + "\n\n")
+
+    def _conversation_messages(self, conversation_history, user_question, session_id=None):
+        """Build the chat messages for a follow-up turn in the conversation"""
+        related = self._related_context(user_question, session_id)
+        entry = next((m for m in conversation_history if m['type'] == 'user_entry'), {'content': ""})
+        if not self.native_chat:
+            # The flattened prompt restates the full entry text, which fit() already counts
+            overhead = sum(estimate_tokens(m['content']) for m in self._flattened_conversation_messages([], ""))
+        elif estimate_tokens(entry['content']) > self.long_entry['threshold']:
+            # A long entry is replayed as its chunk notes, so count those instead of the full text
+            overhead = sum(estimate_tokens(m['content']) for m in self._entry_messages(entry['content'], entry.get('notes'))) \
+                - estimate_tokens(entry['content'])
+        else:
+            overhead = sum(estimate_tokens(m['content']) for m in self._analysis_messages(""))
+        overhead += estimate_tokens(related)
+        conversation_history = self.context.fit(
+            conversation_history, user_question, self._summarize_turns, overhead
+        )
+        if self.native_chat:
+            messages = self._native_conversation_messages(conversation_history, user_question)
+        else:
+            messages = self._flattened_conversation_messages(conversation_history, user_question)
+        if related:
+            # Only the final message changes, so the cached prompt prefix is still reused
+            messages[-1] = {'role': 'user', 'content': related + messages[-1]['content']}
+        return messages
 
-    def continue_conversation(self, conversation_history, user_question):
-        """Continue the therapeutic conversation based on history and new question"""
+    def _native_conversation_messages(self, conversation_history, user_question):
+        """Replay the history as role-tagged turns so every turn shares a byte-identical prefix.
+
+        The opening system and user messages are exactly those sent by analyze_entry,
+        which lets Ollama reuse the prompt cache built for the analysis and each earlier
+        follow-up; only the new question needs to be evaluated.
+        """
+        messages = []
+        for message in conversation_history:
+            if message['type'] == 'user_entry':
+                messages.extend(self._entry_messages(message['content'], message.get('notes')))
+            elif message['type'] in ('analysis', 'ai_response'):
+                messages.append({'role': 'assistant', 'content': message['content']})
+            elif message['type'] == 'user_question':
+                messages.append({'role': 'user', 'content': message['content']})
+            elif message['type'] == 'summary':
+                messages.append({'role': 'system', 'content': f"Summary of the earlier follow-up discussion:\n{message['content']}"})
+        messages.append({'role': 'user', 'content': user_question})
+        return messages
+
+    def _flattened_conversation_messages(self, conversation_history, user_question):
+        """Build a single prompt that restates the whole conversation (legacy mode)"""
         
         system_prompt = """You are continuing a supportive conversation about someone's journal entry. You've already provided an initial analysis. Now the user has a follow-up question or wants to explore something deeper.
 
@@ -92,6 +432,8 @@ Maintain the same compassionate, growth-oriented approach. Build on what you've
                 context += f"User asked: {message['content']}\n"
             elif message['type'] == 'ai_response':
                 context += f"You responded: {message['content']}\n\n"
+            elif message['type'] == 'summary':
+                context += f"Summary of the earlier discussion: {message['content']}\n\n"
 
         user_prompt = f"""{context}
 
@@ -99,27 +441,294 @@ The user now asks or shares: "{user_question}"
 
 Please respond thoughtfully, building on your previous analysis while directly addressing their new question or concern."""
 
+        return [
+            {'role': 'system', 'content': system_prompt},
+            {'role': 'user', 'content': user_prompt}
+        ]
+
+    def _use_cache(self):
+        """Whether responses may be served from and stored in the response cache"""
+        return self.cache is not None and self.cache.cacheable(self.options)
+
+    def _record(self, call_type, started, response=None, **extra):
+        """Report a finished call to the metrics recorder, if one is attached"""
+        if self.metrics is not None:
+            self.metrics.record(call_record(
+                call_type, self.model_name, time.perf_counter() - started, response, session=self.user, **extra
+            ))
+
+    def _slot(self, call_type):
+        """Scheduler slot for a call (yields seconds spent queued), or a no-op without a scheduler"""
+        if self.scheduler is None:
+            return nullcontext(0.0)
+        return self.scheduler.slot(self.priority or call_type, self.user)
+
+    def _chat(self, messages, call_type, format=None, parse=None):
+        """Send messages to Ollama and return the complete reply text.
+
+        format constrains the reply to a JSON schema; parse converts (and validates) the
+        reply, and a reply it rejects is never cached.
+        """
+        started = time.perf_counter()
+        parse = parse or (lambda content: content)
+        key = request_key(self.model_name, messages, self.options if format is None else {**self.options, 'format': format})
+        if self._use_cache():
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._record(call_type, started, cache_hit=True)
+                return parse(cached)
+
+        flight = None
+        if self.single_flight is not None:
+            flight, leader = self.single_flight.join(key)
+            if not leader:
+                try:
+                    content = flight.wait()
+                finally:
+                    self.single_flight.leave(key, flight)
+                # The leader records the generation's token counts; followers only count as shared
+                self._record(call_type, started, cache_hit=False, shared_flight=True)
+                return parse(content)
+
         try:
-            response = self.client.chat(
+            with self._slot(call_type) as queue_wait:
+                response = self.client.chat(
+                    model=self.model_name,
+                    messages=messages,
+                    options=self.options,
+                    keep_alive=KEEP_ALIVE,
+                    format=format
+                )
+            content = response['message']['content']
+            if flight is not None:
+                flight.finish(content)
+        except BaseException as e:
+            if flight is not None:
+                flight.fail(e)
+            raise
+        finally:
+            if flight is not None:
+                self.single_flight.forget(key, flight)
+
+        self._record(call_type, started, response, cache_hit=False, queue_wait=queue_wait)
+        result = parse(content)
+        if self._use_cache():
+            self.cache.put(key, content, self.model_name)
+        return result
+
+    def _stream_reply(self, messages, call_type, started, key):
+        """Stream a reply from Ollama, caching and recording it once it completes"""
+        chunks = []
+        first_token = None
+        final = None
+        with self._slot(call_type) as queue_wait:
+            stream = self.client.chat(
                 model=self.model_name,
-                messages=[
-                    {'role': 'system', 'content': system_prompt},
-                    {'role': 'user', 'content': user_prompt}
-                ],
-                options={
-                    'temperature': 0.7,
-                    'top_p': 0.9,
-                }
+                messages=messages,
+                options=self.options,
+                keep_alive=KEEP_ALIVE,
+                stream=True
             )
+            for chunk in stream:
+                if chunk.get('done'):
+                    final = chunk
+                content = chunk['message']['content']
+                if content:
+                    if first_token is None:
+                        first_token = time.perf_counter() - started
+                    chunks.append(content)
+                    yield content
+
+        if self._use_cache():
+            self.cache.put(key, "".join(chunks), self.model_name)
+        self._record(call_type, started, final, cache_hit=False, time_to_first_token=first_token,
+                     queue_wait=queue_wait)
+
+    def _produce(self, flight, key, messages, call_type, started):
+        """Run a shared streaming generation, publishing its chunks until no caller is left.
+
+        The generation runs on its own thread, so the caller that started it can cancel
+        without cutting off everyone else who joined.
+        """
+        chunks = []
+        try:
+            reply = self._stream_reply(messages, call_type, started, key)
+            for content in reply:
+                chunks.append(content)
+                flight.append(content)
+                if self.single_flight.abandon_if_unused(key, flight):
+                    reply.close()
+                    flight.fail(Exception("The request was cancelled"))
+                    return
+            flight.finish("".join(chunks))
+        except Exception as e:
+            flight.fail(e)
+        finally:
+            self.single_flight.forget(key, flight)
+
+    def _chat_stream(self, messages, call_type):
+        """Send messages to Ollama and yield reply text chunks as they arrive"""
+        started = time.perf_counter()
+        key = request_key(self.model_name, messages, self.options)
+        if self._use_cache():
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._record(call_type, started, cache_hit=True, time_to_first_token=0.0)
+                yield cached
+                return
+
+        if self.single_flight is None:
+            yield from self._stream_reply(messages, call_type, started, key)
+            return
+
+        flight, leader = self.single_flight.join(key)
+        if leader:
+            threading.Thread(
+                target=self._produce, args=(flight, key, messages, call_type, started),
+                name="llm-shared-stream", daemon=True
+            ).start()
+        first_token = None
+        try:
+            for content in flight.iter_chunks():
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                yield content
+        finally:
+            self.single_flight.leave(key, flight)
+        if not leader:
+            self._record(call_type, started, cache_hit=False, time_to_first_token=first_token, shared_flight=True)
+
+    def analyze_entry(self, journal_entry):
+        """Analyze journal entry for emotional content and cognitive distortions"""
+        try:
+            return self._chat(self._entry_messages(journal_entry), 'analysis')
+            
+        except SchedulerBusy:
+            raise
+        except Exception as e:
+            raise Exception(f"Error analyzing entry with Ollama: {str(e)}")
+
+    def analyze_entry_structured(self, journal_entry):
+        """Analyze a journal entry as validated JSON (emotions, distortions, themes and guidance)"""
+        messages = self._entry_messages(journal_entry)
+        messages[-1] = {'role': 'user', 'content': f"{messages[-1]['content']}\n\n{STRUCTURED_INSTRUCTIONS}"}
+        try:
+            return self._chat(messages, 'analysis', format=ANALYSIS_SCHEMA, parse=parse_analysis)
+            
+        except SchedulerBusy:
+            raise
+        except Exception as e:
+            raise Exception(f"Error analyzing entry with Ollama: {str(e)}")
+
+    def analyze_entry_stream(self, journal_entry):
+        """Streaming variant of analyze_entry that yields text chunks as they are generated"""
+        try:
+            yield from self._chat_stream(self._entry_messages(journal_entry), 'analysis')
+            
+        except SchedulerBusy:
+            raise
+        except Exception as e:
+            raise Exception(f"Error analyzing entry with Ollama: {str(e)}")
+
+    def continue_conversation(self, conversation_history, user_question, session_id=None):
+        """Continue the therapeutic conversation based on history and new question.
+
+        session_id identifies the current session so it is left out of related past entries.
+        """
+        try:
+            return self._chat(self._conversation_messages(conversation_history, user_question, session_id), 'follow_up')
             
-            return response['message']['content']
+        except SchedulerBusy:
+            raise
+        except Exception as e:
+            raise Exception(f"Error continuing conversation with Ollama: {str(e)}")
+
+    def continue_conversation_stream(self, conversation_history, user_question, session_id=None):
+        """Streaming variant of continue_conversation that yields text chunks as they are generated"""
+        try:
+            yield from self._chat_stream(
+                self._conversation_messages(conversation_history, user_question, session_id), 'follow_up'
+            )
             
+        except SchedulerBusy:
+            raise
         except Exception as e:
             raise Exception(f"Error continuing conversation with Ollama: {str(e)}")
 
+    def _transcript(self, turns):
+        """Render follow-up turns as a plain User/Assistant transcript"""
+        transcript = ""
+        for message in turns:
+            if message['type'] == 'user_question':
+                transcript += f"User: {message['content']}\n"
+            elif message['type'] == 'ai_response':
+                transcript += f"Assistant: {message['content']}\n\n"
+        return transcript
+
+    def _summary_messages(self, prompt, journal_entry, new_turns=None, previous_summary=None):
+        """Build the chat messages for a session summary, or for updating an earlier one"""
+        transcript = self._transcript(new_turns or [])
+        if previous_summary is not None:
+            summary_prompt = f"""Here is the summary of this journaling session so far:
+
+{previous_summary}
+
+Update it to reflect these new follow-up exchanges, keeping the same structure and staying concise:
+
+{transcript}"""
+        else:
+            summary_prompt = f"""Please provide a concise summary of this journaling session focusing on:
+1. Key emotions and themes
+2. Main insights discovered
+3. Progress or growth identified
+4. Important action items or reflections to remember
+
+Session content:
+Prompt: {prompt}
+Entry: {journal_entry}
+"""
+            if transcript:
+                summary_prompt += f"\nFollow-up conversation:\n{transcript}"
+        return [
+            {'role': 'system', 'content': "You summarize journaling sessions clearly and supportively."},
+            {'role': 'user', 'content': summary_prompt}
+        ]
+
+    def _summarize_turns(self, previous_summary, turns):
+        """Fold older follow-up turns into the rolling conversation summary"""
+        transcript = self._transcript(turns)
+
+        user_prompt = f"""Update the running summary of a supportive journaling conversation.
+
+Current summary:
+{previous_summary or "(none yet)"}
+
+New exchanges to fold in:
+{transcript}
+Write a compact summary (under 200 words) that keeps the user's key concerns, insights and any advice already given."""
+
+        return self._chat([
+            {'role': 'system', 'content': "You maintain concise running summaries of conversations."},
+            {'role': 'user', 'content': user_prompt}
+        ], 'context_summary')
+
+    def summarize_session(self, prompt, journal_entry, new_turns=None, previous_summary=None):
+        """Summarize a journaling session for export.
+
+        Pass previous_summary with only the turns added since it was written to update
+        an earlier summary incrementally instead of re-reading the whole session.
+        """
+        try:
+            return self._chat(self._summary_messages(prompt, journal_entry, new_turns, previous_summary), 'summary')
+            
+        except SchedulerBusy:
+            raise
+        except Exception as e:
+            raise Exception(f"Error summarizing session with Ollama: {str(e)}")
+
     def get_available_models(self):
-        """Get list of available models in Ollama"""
+        """Get list of available models in Ollama from the cached catalog"""
         try:
-            return [model.model for model in ollama.list()["models"]] 
+            return self.catalog.models()
         except Exception:
             return []
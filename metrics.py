@@ -0,0 +1,130 @@
+"""
+Per-call LLM instrumentation: recent-call buffer, rotating JSONL log and Prometheus text export
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+
+# Timing fields Ollama reports on every completed generation (durations are nanoseconds)
+OLLAMA_FIELDS = (
+    'total_duration', 'load_duration', 'prompt_eval_count',
+    'prompt_eval_duration', 'eval_count', 'eval_duration',
+)
+
+
+def call_record(call_type, model, wall_time, response=None, **extra):
+    """Build a metrics record from Ollama's final response plus client-side timings"""
+    record = {
+        'timestamp': datetime.now().isoformat(),
+        'call_type': call_type,
+        'model': model,
+        'wall_time': wall_time,
+    }
+    for field in OLLAMA_FIELDS:
+        record[field] = (response.get(field) if response is not None else None) or 0
+    if record['eval_duration']:
+        record['tokens_per_second'] = record['eval_count'] / (record['eval_duration'] / 1e9)
+    else:
+        record['tokens_per_second'] = 0.0
+    record.update(extra)
+    return record
+
+
+class MetricsRecorder:
+    def __init__(self, path=None, max_bytes=5_000_000, backup_count=3, recent=200):
+        """Keep recent call records in memory and append every record to a rotating JSONL file"""
+        self.path = path if path is not None else os.getenv("LLM_METRICS_PATH", "llm_metrics.jsonl")
+        self._recent = deque(maxlen=recent)
+        self._totals = {}
+        self._lock = threading.Lock()
+        self._logger = None
+        if self.path:
+            self._logger = logging.getLogger(f"llm_metrics.{id(self)}")
+            self._logger.propagate = False
+            self._logger.setLevel(logging.INFO)
+            handler = RotatingFileHandler(self.path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._logger.addHandler(handler)
+
+    def record(self, record):
+        """Store one call record"""
+        with self._lock:
+            self._recent.append(record)
+            key = (record['call_type'], record['model'])
+            totals = self._totals.setdefault(key, {
+                'calls': 0, 'cache_hits': 0, 'shared_flights': 0, 'wall_time': 0.0, 'queue_wait': 0.0, 'load_duration': 0,
+                'prompt_eval_count': 0, 'prompt_eval_duration': 0, 'eval_count': 0, 'eval_duration': 0,
+            })
+            totals['calls'] += 1
+            totals['cache_hits'] += 1 if record.get('cache_hit') else 0
+            totals['shared_flights'] += 1 if record.get('shared_flight') else 0
+            totals['wall_time'] += record['wall_time']
+            totals['queue_wait'] += record.get('queue_wait') or 0.0
+            for field in ('load_duration', 'prompt_eval_count', 'prompt_eval_duration', 'eval_count', 'eval_duration'):
+                totals[field] += record[field]
+        if self._logger is not None:
+            self._logger.info(json.dumps(record))
+
+    def recent(self, limit=None, session=None):
+        """Most recent records, newest last; session keeps only the calls made for one app session"""
+        with self._lock:
+            records = [record for record in self._recent if session is None or record.get('session') == session]
+        return records[-limit:] if limit else records
+
+    def totals(self):
+        """Aggregated totals per (call_type, model)"""
+        with self._lock:
+            return {key: dict(value) for key, value in self._totals.items()}
+
+    def prometheus_text(self):
+        """Render the aggregated totals in the Prometheus text exposition format"""
+        lines = []
+        series = (
+            ('llm_calls_total', 'counter', 'LLM calls made', 'calls', 1),
+            ('llm_cache_hits_total', 'counter', 'LLM calls served from the response cache', 'cache_hits', 1),
+            ('llm_shared_flights_total', 'counter', 'LLM calls that joined an identical in-flight generation', 'shared_flights', 1),
+            ('llm_wall_seconds_total', 'counter', 'Client-side wall-clock time spent in LLM calls', 'wall_time', 1),
+            ('llm_queue_wait_seconds_total', 'counter', 'Time LLM calls spent waiting for a scheduler slot', 'queue_wait', 1),
+            ('llm_load_seconds_total', 'counter', 'Time Ollama spent loading models', 'load_duration', 1e-9),
+            ('llm_prompt_tokens_total', 'counter', 'Prompt tokens evaluated', 'prompt_eval_count', 1),
+            ('llm_prompt_eval_seconds_total', 'counter', 'Time spent evaluating prompts', 'prompt_eval_duration', 1e-9),
+            ('llm_generated_tokens_total', 'counter', 'Tokens generated', 'eval_count', 1),
+            ('llm_generation_seconds_total', 'counter', 'Time spent generating tokens', 'eval_duration', 1e-9),
+        )
+        totals = self.totals()
+        for name, kind, help_text, field, scale in series:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (call_type, model), values in sorted(totals.items()):
+                lines.append(f'{name}{{call_type="{call_type}",model="{model}"}} {values[field] * scale}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """Expose prometheus_text() at /metrics on a background HTTP server"""
+        recorder = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = recorder.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        return server
@@ -0,0 +1,105 @@
+"""
+Background model pre-warming and a bounded set of resident Ollama models
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def _canonical(model):
+    """Model name as Ollama reports it, with the implicit ':latest' tag spelled out"""
+    return model if ":" in model else f"{model}:latest"
+
+
+class ModelWarmer:
+    def __init__(self, client, keep_alive=None, max_resident=None, pinned=(), in_use_ttl=None):
+        """Preload models with an empty generate and keep at most max_resident of them loaded.
+
+        The loaded set is read from Ollama (/api/ps), so models loaded by chat requests count
+        towards the limit too; if that fails, the models warmed here are used instead. When a
+        warm-up pushes the count over max_resident the model closest to expiring is unloaded
+        (keep_alive=0), skipping pinned models and any model a session has used within
+        in_use_ttl seconds, so one session's dropdown can never unload another's model.
+        """
+        self.client = client
+        self.keep_alive = keep_alive or os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+        self.max_resident = max_resident or int(os.getenv("OLLAMA_MAX_RESIDENT", "2"))
+        self.in_use_ttl = in_use_ttl or float(os.getenv("OLLAMA_IN_USE_TTL", "1800"))
+        self.pinned = {_canonical(model) for model in pinned}
+        self._resident = OrderedDict()
+        self._status = {}
+        self._in_use = {}
+        self._lock = threading.Lock()
+
+    def status(self, model):
+        """'warming', 'ready', 'failed' or None if the model was never warmed"""
+        with self._lock:
+            return self._status.get(model)
+
+    def use(self, session, model):
+        """Record that a session is chatting with model, protecting it from eviction"""
+        with self._lock:
+            self._in_use[session] = (_canonical(model), time.monotonic())
+
+    def _protected(self):
+        """Pinned models plus models a session has used recently; caller holds the lock"""
+        cutoff = time.monotonic() - self.in_use_ttl
+        for session, (model, seen) in list(self._in_use.items()):
+            if seen < cutoff:
+                del self._in_use[session]
+        return self.pinned | {model for model, _ in self._in_use.values()}
+
+    def _loaded(self):
+        """Names of the loaded models, closest to expiring (least recently used) first"""
+        try:
+            models = self.client.ps()['models']
+        except Exception:
+            with self._lock:
+                return list(self._resident)
+        models = sorted(models, key=lambda model: (model.expires_at is not None, model.expires_at or 0))
+        return list(dict.fromkeys(model.model or model.name for model in models))
+
+    def warm(self, model):
+        """Start loading a model in the background; repeated calls while warm are free"""
+        with self._lock:
+            if self._status.get(model) in ('warming', 'ready'):
+                if model in self._resident:
+                    self._resident.move_to_end(model)
+                return
+            self._status[model] = 'warming'
+        threading.Thread(target=self._load, args=(model,), name=f"warm-{model}", daemon=True).start()
+
+    def _load(self, model):
+        """Issue the empty generate that makes Ollama load the model, then enforce the residency limit"""
+        try:
+            self.client.generate(model=model, prompt="", keep_alive=self.keep_alive)
+        except Exception:
+            with self._lock:
+                self._status[model] = 'failed'
+            return
+
+        with self._lock:
+            self._status[model] = 'ready'
+            self._resident[model] = True
+            self._resident.move_to_end(model)
+
+        loaded = self._loaded()
+        if _canonical(model) not in map(_canonical, loaded):
+            loaded.append(model)
+        with self._lock:
+            protected = self._protected() | {_canonical(model)}
+            candidates = [name for name in loaded if _canonical(name) not in protected]
+            evict = candidates[:max(0, len(loaded) - self.max_resident)]
+            evicted = set(map(_canonical, evict))
+            for name in list(self._resident):
+                if _canonical(name) in evicted:
+                    del self._resident[name]
+                    self._status.pop(name, None)
+
+        for name in evict:
+            try:
+                self.client.generate(model=name, prompt="", keep_alive=0)
+            except Exception:
+                pass
@@ -0,0 +1,111 @@
+"""
+Journaling prompt recommendation from prompt embeddings and the user's recent entries
+"""
+
+import os
+import random
+import threading
+
+import numpy as np
+
+
+def load_prompt_library(base_prompts, path=None):
+    """Combine the built-in prompts with a user library (one prompt per line), without duplicates"""
+    path = path if path is not None else os.getenv("JOURNAL_PROMPTS_PATH", "")
+    prompts = list(base_prompts)
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            prompts.extend(line.strip() for line in f if line.strip())
+    return list(dict.fromkeys(prompts))
+
+
+class PromptRecommender:
+    def __init__(self, index, prompts, cache_path=None, recent_entries=5, candidates=5, shortlist=50,
+                 redundancy_weight=0.5):
+        """Recommend prompts close to what the user has been writing about, without repeats.
+
+        Prompt embeddings are computed once on a background thread through the index's
+        embedding model and cached on disk by prompt text, so editing the prompt library only
+        embeds the prompts that changed. Until they are ready, and whenever there are no
+        entries to go on, recommend() falls back to a non-repeating random pick.
+        """
+        self.index = index
+        self.prompts = list(prompts)
+        self._positions = {prompt: i for i, prompt in enumerate(self.prompts)}
+        self.cache_path = cache_path or os.getenv("PROMPT_EMBEDDINGS_PATH", "prompt_embeddings.npz")
+        self.recent_entries = recent_entries
+        self.candidates = candidates
+        self.shortlist = shortlist
+        self.redundancy_weight = redundancy_weight
+        self.matrix = None
+        self.last_error = None
+        self._profile = None
+        self._profile_rows = -1
+        self._lock = threading.Lock()
+        threading.Thread(target=self._prepare, name="prompt-embeddings", daemon=True).start()
+
+    def _prepare(self):
+        """Load cached prompt embeddings, embedding any prompts the cache does not cover"""
+        try:
+            cached = {}
+            if os.path.exists(self.cache_path):
+                with np.load(self.cache_path) as data:
+                    if str(data['model']) == self.index.model:
+                        cached = dict(zip(data['prompts'].tolist(), data['vectors']))
+            missing = [prompt for prompt in self.prompts if prompt not in cached]
+            if missing:
+                cached.update(zip(missing, self.index.embed(missing)))
+                np.savez(
+                    self.cache_path,
+                    model=np.array(self.index.model),
+                    prompts=np.array(self.prompts),
+                    vectors=np.stack([cached[prompt] for prompt in self.prompts]).astype(np.float32),
+                )
+            self.matrix = np.stack([cached[prompt] for prompt in self.prompts]).astype(np.float32)
+        except Exception as e:
+            self.last_error = str(e)
+
+    def _recent_profile(self):
+        """Unit-length mean of the latest entry vectors, recomputed only when the index has grown"""
+        rows = len(self.index)
+        if rows != self._profile_rows:
+            vectors = self.index.recent_vectors(self.recent_entries)
+            profile = None
+            if len(vectors):
+                mean = vectors.mean(axis=0)
+                norm = np.linalg.norm(mean)
+                profile = mean / norm if norm else None
+            self._profile, self._profile_rows = profile, rows
+        return self._profile
+
+    def recommend(self, recent=()):
+        """Pick the next prompt, never one of the recently shown prompts in recent"""
+        with self._lock:
+            count = len(self.prompts)
+            shown = {self._positions[prompt] for prompt in recent if prompt in self._positions}
+            if len(shown) >= count:
+                shown = set()
+
+            profile = self._recent_profile() if self.matrix is not None else None
+            if profile is None:
+                choice = random.randrange(count)
+                while choice in shown:
+                    choice = random.randrange(count)
+            else:
+                scores = self.matrix @ profile
+                scores[list(shown)] = -np.inf
+                size = min(self.shortlist, count - len(shown))
+                shortlist = np.argpartition(-scores, size - 1)[:size]
+                relevance = scores[shortlist]
+                if shown:
+                    # Prefer prompts unlike the ones just shown, so picks don't cluster on one theme
+                    relevance = relevance - self.redundancy_weight * (
+                        self.matrix[shortlist] @ self.matrix[list(shown)].T
+                    ).max(axis=1)
+                top = min(self.candidates, size)
+                choice = int(random.choice(shortlist[np.argpartition(-relevance, top - 1)[:top]]))
+            return self.prompts[choice]
+
+    def status(self):
+        """Whether prompt embeddings are ready, for diagnostics"""
+        return {'prompts': len(self.prompts), 'ready': self.matrix is not None, 'last_error': self.last_error}
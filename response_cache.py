@@ -0,0 +1,145 @@
+"""
+Content-addressed cache for LLM chat responses with in-memory LRU and on-disk persistence
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT,
+    content TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    used_at TEXT
+);
+"""
+
+
+def request_key(model, messages, options):
+    """Hash a chat request (model, messages, options) into a stable cache key"""
+    payload = json.dumps(
+        {'model': model, 'messages': messages, 'options': options},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path=None, max_entries=256, skip_sampled=None, max_disk_entries=None, ttl_days=None):
+        """Create the cache, backed by a SQLite file unless path is ':memory:'.
+
+        The file keeps at most max_disk_entries responses (LLM_CACHE_MAX_ENTRIES), dropping the
+        least recently used, and responses older than ttl_days (LLM_CACHE_TTL_DAYS, 0 for
+        never) are treated as misses and purged.
+        """
+        self.path = path or os.getenv("LLM_CACHE_PATH", "response_cache.db")
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries or int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+        self.ttl_days = ttl_days if ttl_days is not None else float(os.getenv("LLM_CACHE_TTL_DAYS", "30"))
+        if skip_sampled is None:
+            skip_sampled = os.getenv("LLM_CACHE_SKIP_SAMPLED", "false").lower() == "true"
+        self.skip_sampled = skip_sampled
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        # Caches written before responses tracked their last use
+        if "used_at" not in [row[1] for row in self._conn.execute("PRAGMA table_info(responses)")]:
+            self._conn.execute("ALTER TABLE responses ADD COLUMN used_at TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_used_at ON responses(used_at)")
+        self.purge()
+
+    def _expired_before(self):
+        """Creation time before which responses have expired, or None without a TTL"""
+        if not self.ttl_days:
+            return None
+        return (datetime.now() - timedelta(days=self.ttl_days)).isoformat()
+
+    def cacheable(self, options):
+        """Whether a request with these options may be served from the cache"""
+        return not (self.skip_sampled and (options or {}).get('temperature', 0) > 0)
+
+    def get(self, key):
+        """Return the cached response for key, or None on a miss"""
+        expired_before = self._expired_before()
+        with self._lock:
+            if key in self._entries:
+                content, created_at = self._entries[key]
+                if expired_before is None or created_at >= expired_before:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return content
+                del self._entries[key]
+
+            row = self._conn.execute("SELECT content, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (expired_before is not None and row[1] < expired_before):
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            with self._conn:
+                self._conn.execute("UPDATE responses SET used_at = ? WHERE key = ?", (datetime.now().isoformat(), key))
+            self._remember(key, row[0], row[1])
+            return row[0]
+
+    def put(self, key, content, model=None):
+        """Store a response in memory and on disk, dropping the least recently used beyond the disk cap"""
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._remember(key, content, now)
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, content, created_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, model, content, now, now)
+                )
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY COALESCE(used_at, created_at) DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,)
+                )
+
+    def _remember(self, key, content, created_at):
+        """Insert into the in-memory LRU, evicting the least recently used entry when full"""
+        self._entries[key] = (content, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def purge(self, older_than_days=None):
+        """Delete responses created more than older_than_days ago (default: the TTL); returns how many"""
+        days = older_than_days if older_than_days is not None else self.ttl_days
+        if not days:
+            return 0
+        cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+        with self._lock:
+            for key in [key for key, (_, created_at) in self._entries.items() if created_at < cutoff]:
+                del self._entries[key]
+            with self._conn:
+                return self._conn.execute("DELETE FROM responses WHERE created_at < ?", (cutoff,)).rowcount
+
+    def clear(self):
+        """Drop every cached response from memory and disk"""
+        with self._lock:
+            self._entries.clear()
+            with self._conn:
+                self._conn.execute("DELETE FROM responses")
+
+    def stats(self):
+        """Return hit/miss counters and the current in-memory size"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': len(self._entries),
+            }
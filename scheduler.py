@@ -0,0 +1,102 @@
+"""
+Priority-aware admission control for LLM requests
+"""
+
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Lower numbers are served first
+PRIORITIES = {
+    'follow_up': 0,
+    'context_summary': 0,
+    'analysis': 1,
+    'analysis_chunk': 1,
+    'summary': 2,
+    'batch': 3,
+}
+
+
+class SchedulerBusy(Exception):
+    def __init__(self, retry_after):
+        """Raised instead of queueing when the wait queue is already full"""
+        self.retry_after = retry_after
+        super().__init__(f"The AI is busy right now, please retry in {retry_after:.0f}s")
+
+
+class Scheduler:
+    def __init__(self, max_concurrent=None, max_queue=None):
+        """Admit at most max_concurrent LLM calls at once, queueing up to max_queue more.
+
+        Waiting calls are granted by priority class, then to the user with the fewest calls
+        already running, then in arrival order, so one user's burst of summaries cannot
+        starve another user's follow-up.
+        """
+        self.max_concurrent = max_concurrent or int(os.getenv("LLM_MAX_CONCURRENT", "4"))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("LLM_MAX_QUEUE", "32"))
+        self._running = 0
+        self._running_by_user = {}
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._avg_service = 10.0
+        self._lock = threading.Lock()
+
+    def _retry_after(self):
+        """Estimate how long until the queue drains enough to accept new work"""
+        return max(1.0, self._avg_service * (len(self._waiting) + 1) / self.max_concurrent)
+
+    def _grant_next(self):
+        """Hand free slots to the best waiting requests; caller holds the lock"""
+        while self._waiting and self._running < self.max_concurrent:
+            best = min(self._waiting, key=lambda w: (
+                w['priority'], self._running_by_user.get(w['user'], 0), w['sequence']
+            ))
+            self._waiting.remove(best)
+            self._start(best['user'])
+            best['granted'].set()
+
+    def _start(self, user):
+        self._running += 1
+        self._running_by_user[user] = self._running_by_user.get(user, 0) + 1
+
+    @contextmanager
+    def slot(self, call_type, user=None):
+        """Hold a concurrency slot for the duration of the block; yields the seconds spent queued"""
+        priority = PRIORITIES.get(call_type, PRIORITIES['batch'])
+        waiter = None
+        queued_at = time.perf_counter()
+        with self._lock:
+            if self._running < self.max_concurrent and not self._waiting:
+                self._start(user)
+            elif len(self._waiting) >= self.max_queue:
+                raise SchedulerBusy(self._retry_after())
+            else:
+                waiter = {
+                    'priority': priority, 'user': user,
+                    'sequence': next(self._sequence), 'granted': threading.Event(),
+                }
+                self._waiting.append(waiter)
+
+        if waiter is not None:
+            waiter['granted'].wait()
+        started = time.perf_counter()
+        try:
+            yield started - queued_at
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._running_by_user[user] -= 1
+                if not self._running_by_user[user]:
+                    del self._running_by_user[user]
+                self._avg_service = 0.8 * self._avg_service + 0.2 * (time.perf_counter() - started)
+                self._grant_next()
+
+    def status(self):
+        """Current load: running calls and queue depth per priority class"""
+        with self._lock:
+            queued = {}
+            for waiter in self._waiting:
+                queued[waiter['priority']] = queued.get(waiter['priority'], 0) + 1
+            return {'running': self._running, 'queued': len(self._waiting), 'queued_by_priority': queued}
@@ -0,0 +1,103 @@
+"""
+Single-flight deduplication: identical concurrent LLM requests share one generation
+"""
+
+import threading
+
+
+class Flight:
+    def __init__(self):
+        """One in-flight generation whose chunks and result are shared with every caller"""
+        self.chunks = []
+        self.result = None
+        self.error = None
+        self.done = False
+        self.subscribers = 1
+        self._cond = threading.Condition()
+
+    def append(self, chunk):
+        """Publish a streamed chunk to followers"""
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, result):
+        """Publish the complete reply"""
+        with self._cond:
+            self.result = result
+            self.done = True
+            self._cond.notify_all()
+
+    def fail(self, error):
+        """Propagate the generation's failure to every caller"""
+        with self._cond:
+            if not self.done:
+                self.error = error
+                self.done = True
+                self._cond.notify_all()
+
+    def wait(self):
+        """Block until the generation finishes and return its text"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.done)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def iter_chunks(self):
+        """Yield every chunk, including ones published before the caller joined.
+
+        A generation that was not streamed publishes no chunks, so its result is
+        yielded as a single chunk instead.
+        """
+        index = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self.chunks) > index or self.done)
+                new = self.chunks[index:]
+                done = self.done
+            index += len(new)
+            yield from new
+            if done and index >= len(self.chunks):
+                break
+        if self.error is not None:
+            raise self.error
+        if index == 0 and self.result:
+            yield self.result
+
+
+class SingleFlight:
+    def __init__(self):
+        """Registry of in-flight generations keyed on the request fingerprint"""
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def join(self, key):
+        """Return (flight, is_leader) and subscribe to it; only the leader should call Ollama"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.subscribers += 1
+                return flight, False
+            flight = self._flights[key] = Flight()
+            return flight, True
+
+    def leave(self, key, flight):
+        """Unsubscribe a caller that has finished with (or abandoned) a flight"""
+        with self._lock:
+            flight.subscribers -= 1
+
+    def abandon_if_unused(self, key, flight):
+        """Drop a flight nobody is waiting on any more; returns True if the generation can stop"""
+        with self._lock:
+            if flight.subscribers > 0:
+                return False
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            return True
+
+    def forget(self, key, flight):
+        """Remove a finished flight so later identical requests start a fresh one"""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
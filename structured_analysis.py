@@ -0,0 +1,135 @@
+"""
+Machine-readable journal analysis: JSON schema for Ollama's format option, validation and rendering
+"""
+
+import json
+
+# Cognitive distortions the analysis may name, as listed in the analysis system prompt
+DISTORTIONS = (
+    "all-or-nothing thinking",
+    "overgeneralization",
+    "mental filter",
+    "disqualifying the positive",
+    "mind reading",
+    "fortune telling",
+    "catastrophizing",
+    "emotional reasoning",
+    "should statements",
+    "labeling",
+    "personalization",
+    "blaming",
+)
+
+ANALYSIS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'emotions': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'name': {'type': 'string'},
+                    'intensity': {'type': 'integer', 'minimum': 1, 'maximum': 10},
+                },
+                'required': ['name', 'intensity'],
+            },
+        },
+        'distortions': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'name': {'type': 'string', 'enum': list(DISTORTIONS)},
+                    'evidence': {'type': 'string'},
+                },
+                'required': ['name', 'evidence'],
+            },
+        },
+        'themes': {'type': 'array', 'items': {'type': 'string'}},
+        'summary': {'type': 'string'},
+        'reframing': {'type': 'array', 'items': {'type': 'string'}},
+        'questions': {'type': 'array', 'items': {'type': 'string'}},
+    },
+    'required': ['emotions', 'distortions', 'themes', 'summary', 'reframing', 'questions'],
+}
+
+STRUCTURED_INSTRUCTIONS = f"""Respond only with JSON containing:
+- "emotions": the key emotions, each with a "name" and an "intensity" from 1 (faint) to 10 (overwhelming)
+- "distortions": cognitive distortions present, each with a "name" from this list: {", ".join(DISTORTIONS)}; and the "evidence" phrase from the entry
+- "themes": two to five short themes (e.g. "work stress", "family")
+- "summary": two or three warm sentences summarizing the emotional content
+- "reframing": gentle, realistic alternative perspectives
+- "questions": supportive questions that encourage self-reflection"""
+
+
+def _strings(value, field):
+    """Validate a list of non-empty strings"""
+    if not isinstance(value, list):
+        raise ValueError(f"'{field}' must be a list")
+    return [item.strip() for item in value if isinstance(item, str) and item.strip()]
+
+
+def parse_analysis(text):
+    """Parse and validate a structured analysis, normalising names and clamping intensities.
+
+    Raises ValueError if the reply is not JSON or is missing required fields.
+    """
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Analysis is not valid JSON: {str(e)}")
+    if not isinstance(data, dict):
+        raise ValueError("Analysis must be a JSON object")
+    missing = [field for field in ANALYSIS_SCHEMA['required'] if field not in data]
+    if missing:
+        raise ValueError(f"Analysis is missing {', '.join(missing)}")
+
+    emotions = {}
+    for emotion in data['emotions'] if isinstance(data['emotions'], list) else []:
+        if not isinstance(emotion, dict) or not isinstance(emotion.get('name'), str) or not emotion['name'].strip():
+            continue
+        try:
+            intensity = min(10, max(1, int(emotion.get('intensity', 5))))
+        except (TypeError, ValueError):
+            intensity = 5
+        name = emotion['name'].strip().lower()
+        emotions[name] = max(intensity, emotions.get(name, 0))
+
+    distortions = {}
+    for distortion in data['distortions'] if isinstance(data['distortions'], list) else []:
+        if not isinstance(distortion, dict) or not isinstance(distortion.get('name'), str):
+            continue
+        name = distortion['name'].strip().lower().replace("_", " ")
+        if name in DISTORTIONS and name not in distortions:
+            distortions[name] = str(distortion.get('evidence') or "").strip()
+
+    return {
+        'emotions': [{'name': name, 'intensity': intensity} for name, intensity in emotions.items()],
+        'distortions': [{'name': name, 'evidence': evidence} for name, evidence in distortions.items()],
+        'themes': list(dict.fromkeys(theme.lower() for theme in _strings(data['themes'], 'themes'))),
+        'summary': str(data['summary']).strip(),
+        'reframing': _strings(data['reframing'], 'reframing'),
+        'questions': _strings(data['questions'], 'questions'),
+    }
+
+
+def render_analysis(data):
+    """Render a structured analysis in the usual four-part markdown format"""
+    emotions = ", ".join(f"{emotion['name']} ({emotion['intensity']}/10)" for emotion in data['emotions'])
+    text = f"1. **Emotional Summary**: {data['summary']}"
+    if emotions:
+        text += f"\n\n   Emotions: {emotions}"
+    text += "\n\n2. **Cognitive Patterns**:"
+    if data['distortions']:
+        for distortion in data['distortions']:
+            evidence = f' - "{distortion["evidence"]}"' if distortion['evidence'] else ""
+            text += f"\n   - *{distortion['name'].capitalize()}*{evidence}"
+    else:
+        text += " No strong cognitive distortions stood out in this entry."
+    text += "\n\n3. **Reframing Suggestions**:"
+    for suggestion in data['reframing']:
+        text += f"\n   - {suggestion}"
+    text += "\n\n4. **Supportive Questions**:"
+    for question in data['questions']:
+        text += f"\n   - {question}"
+    return text
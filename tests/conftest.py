@@ -0,0 +1,27 @@
+"""
+Shared fixtures: the repo root on sys.path and stand-in Ollama servers
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_ollama import FakeOllama
+
+
+@pytest.fixture
+def fake_ollama():
+    """Start FakeOllama servers with the given options; all are stopped after the test"""
+    servers = []
+
+    def start(**options):
+        server = FakeOllama(**options).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
@@ -0,0 +1,83 @@
+"""
+Context budgeting: the rolling summary keeps follow-ups under a hard ceiling
+"""
+
+import ollama
+
+from context_manager import ContextManager, estimate_tokens
+from llm_analyzer import LLMAnalyzer
+
+QUESTION = "Why do I keep feeling this way?"
+
+
+def history(entry_words=300, analysis_words=400, pairs=1):
+    """Entry, analysis and pairs of follow-ups, with sizes in whitespace-separated words"""
+    messages = [
+        {'type': 'user_entry', 'content': "entry " * entry_words},
+        {'type': 'analysis', 'content': "analysis " * analysis_words},
+    ]
+    for i in range(pairs):
+        messages.append({'type': 'user_question', 'content': f"question {i} " * 25})
+        messages.append({'type': 'ai_response', 'content': f"response {i} " * 25})
+    return messages
+
+
+def tokens(messages, question=QUESTION):
+    return sum(estimate_tokens(message['content']) for message in messages) + estimate_tokens(question)
+
+
+def test_history_within_budget_is_untouched():
+    context = ContextManager(num_ctx=8192)
+    conversation = history(pairs=3)
+    assert context.fit(conversation, QUESTION, lambda summary, turns: "unused") == conversation
+
+
+def test_old_turns_fold_into_summary_keeping_latest_pair():
+    context = ContextManager(num_ctx=1024 + 1100)
+    conversation = history(entry_words=100, analysis_words=100, pairs=20)
+    folded = []
+
+    def summarize(summary, turns):
+        folded.append(len(turns))
+        return "short summary"
+
+    fitted = context.fit(conversation, QUESTION, summarize)
+    assert tokens(fitted) <= context.budget
+    assert [message['type'] for message in fitted[:3]] == ['user_entry', 'analysis', 'summary']
+    assert fitted[-2:] == conversation[-2:]
+    assert folded and all(count % 2 == 0 for count in folded)
+
+    # One more pair fits under the high watermark without summarising again
+    conversation += [{'type': 'user_question', 'content': "one more"}, {'type': 'ai_response', 'content': "ok"}]
+    context.fit(conversation, QUESTION, summarize)
+    assert len(folded) == 1
+
+
+def test_budget_is_a_hard_ceiling():
+    # Budget 300 tokens; the entry fits but the pinned analysis alone is over it
+    context = ContextManager(num_ctx=1024 + 300)
+    conversation = history(entry_words=100, pairs=1)
+    fitted = context.fit(conversation, QUESTION, lambda summary, turns: "short summary")
+
+    assert tokens(fitted) <= context.budget
+    assert fitted[0] == conversation[0]
+    assert fitted[1]['type'] == 'analysis' and fitted[1]['content'].endswith("[...]")
+    assert [message['type'] for message in fitted] == ['user_entry', 'analysis', 'summary']
+
+
+def test_flattened_long_entry_follow_up_stays_within_budget(fake_ollama):
+    fake = fake_ollama(token_delay=0)
+    analyzer = LLMAnalyzer(client=ollama.Client(host=fake.url), native_chat=False, num_ctx=2048)
+    entry = " ".join(f"Sentence {i} about a long, hard day at work." for i in range(200))
+    assert estimate_tokens(entry) > analyzer.long_entry['threshold']
+    conversation = [
+        {'type': 'user_entry', 'content': entry},
+        {'type': 'analysis', 'content': "analysis " * 200},
+        {'type': 'user_question', 'content': "What now?"},
+        {'type': 'ai_response', 'content': "response " * 100},
+    ]
+    messages = analyzer._conversation_messages(conversation, QUESTION)
+
+    assert sum(estimate_tokens(message['content']) for message in messages) <= analyzer.context.budget
+    # Only the rolling summary is generated; the long entry is not read in chunks
+    assert fake.stats.get('/api/chat', {}).get('calls', 0) <= 1
@@ -0,0 +1,57 @@
+"""
+Phrase pre-screen: absolutist judgments are flagged, everyday uses of the same words are not
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from distortion_screen import screen
+
+
+def names(text):
+    return [finding['name'] for finding in screen(text)]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("I always mess things up.", "overgeneralization"),
+    ("I never get anything right at work.", "overgeneralization"),
+    ("Nobody ever listens to me.", "overgeneralization"),
+    ("They always ignore me in meetings.", "overgeneralization"),
+    ("I always let everyone down.", "overgeneralization"),
+    ("My life is a disaster.", "catastrophizing"),
+    ("I'm a complete disaster.", "catastrophizing"),
+    ("Because I feel like a failure, I must be one.", "emotional reasoning"),
+    ("I'll never be good enough for this job.", "fortune telling"),
+    ("I only passed because the test was easy.", "disqualifying the positive"),
+])
+def test_flags_absolutist_judgments(text, expected):
+    assert expected in names(text)
+
+
+@pytest.mark.parametrize("text", [
+    "I always go for a run on Sundays.",
+    "I always get up early and get it done on time.",
+    "I'll always remember that trip.",
+    "I'll never forget that trip.",
+    "I never thought I'd enjoy painting this much.",
+    "It never rains here in July.",
+    "She always brings me coffee on Fridays.",
+    "Nobody ever told me about the party.",
+    "The storm was a disaster for the town's crops.",
+    "We watched a disaster movie last night.",
+    "I called because I feel we should talk.",
+    "I went only because it was raining.",
+])
+def test_ignores_everyday_uses(text):
+    assert names(text) == []
+
+
+def test_evidence_is_capped_and_most_frequent_first():
+    findings = screen("I always mess up. I always mess things up. I always mess everything up. It's my fault.")
+    assert findings[0]['name'] == "overgeneralization"
+    assert findings[0]['count'] == 3
+    assert len(findings[0]['evidence']) == 2
@@ -0,0 +1,91 @@
+"""
+Scheduler admission: priority classes first, then the user with the fewest running calls, then busy
+"""
+
+import threading
+import time
+
+import pytest
+
+from scheduler import Scheduler, SchedulerBusy
+
+
+def hold(scheduler, call_type, user, release, order):
+    """Take a slot on a thread, note when it was granted and keep it until release is set"""
+    def run():
+        with scheduler.slot(call_type, user):
+            order.append((call_type, user))
+            release.wait()
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def wait_for(scheduler, field, count, timeout=5.0):
+    """Wait until the scheduler reports count 'running' or 'queued' calls"""
+    deadline = time.monotonic() + timeout
+    while scheduler.status()[field] != count:
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_higher_priority_is_served_first():
+    scheduler = Scheduler(max_concurrent=1, max_queue=8)
+    order = []
+    gate = threading.Event()
+    first = hold(scheduler, 'analysis', "a", gate, order)
+    wait_for(scheduler, 'running', 1)
+    rest = threading.Event()
+    rest.set()
+    waiters = [hold(scheduler, 'summary', "b", rest, order)]
+    wait_for(scheduler, 'queued', 1)
+    waiters.append(hold(scheduler, 'follow_up', "c", rest, order))
+    wait_for(scheduler, 'queued', 2)
+
+    # The later follow-up overtakes the queued summary
+    gate.set()
+    for thread in [first] + waiters:
+        thread.join(timeout=5)
+    assert order == [('analysis', "a"), ('follow_up', "c"), ('summary', "b")]
+
+
+def test_user_with_fewest_running_calls_goes_first():
+    scheduler = Scheduler(max_concurrent=2, max_queue=8)
+    order = []
+    keep_a, release_x = threading.Event(), threading.Event()
+    holders = [hold(scheduler, 'analysis', "a", keep_a, order), hold(scheduler, 'analysis', "x", release_x, order)]
+    wait_for(scheduler, 'running', 2)
+    done = threading.Event()
+    waiters = [hold(scheduler, 'analysis', "a", done, order)]
+    wait_for(scheduler, 'queued', 1)
+    waiters.append(hold(scheduler, 'analysis', "b", done, order))
+    wait_for(scheduler, 'queued', 2)
+
+    # One slot frees up: user b (nothing running) beats user a's earlier request
+    release_x.set()
+    wait_for(scheduler, 'queued', 1)
+    assert order[2:] == [('analysis', "b")]
+    keep_a.set()
+    done.set()
+    for thread in holders + waiters:
+        thread.join(timeout=5)
+    assert order[3:] == [('analysis', "a")]
+
+
+def test_full_queue_raises_busy_with_retry_hint():
+    scheduler = Scheduler(max_concurrent=1, max_queue=1)
+    release = threading.Event()
+    order = []
+    threads = [hold(scheduler, 'analysis', "a", release, order)]
+    wait_for(scheduler, 'running', 1)
+    threads.append(hold(scheduler, 'analysis', "b", release, order))
+    wait_for(scheduler, 'queued', 1)
+
+    with pytest.raises(SchedulerBusy) as busy:
+        with scheduler.slot('follow_up', "c"):
+            pass
+    assert busy.value.retry_after >= 1
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert scheduler.status() == {'running': 0, 'queued': 0, 'queued_by_priority': {}}
@@ -0,0 +1,101 @@
+"""
+Single-flight sharing: identical concurrent requests make one Ollama call, whoever cancels
+"""
+
+import threading
+import time
+
+import ollama
+
+from llm_analyzer import LLMAnalyzer
+from metrics import MetricsRecorder
+from single_flight import Flight, SingleFlight
+
+ENTRY = "Today I snapped at a coworker and I'm sure everyone thinks I'm difficult to work with."
+REPLY_TOKENS = 20
+
+
+def analyzers(fake, count=2):
+    """Analyzers sharing one SingleFlight and one metrics recorder, as the app's sessions do"""
+    single_flight = SingleFlight()
+    metrics = MetricsRecorder(path="")
+    client = ollama.Client(host=fake.url)
+    return [
+        LLMAnalyzer(client=client, metrics=metrics, single_flight=single_flight, user=f"user-{i}")
+        for i in range(count)
+    ], single_flight, metrics
+
+
+def chat_calls(fake):
+    return fake.stats.get('/api/chat', {}).get('calls', 0)
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_blocking_result_is_replayed_to_late_iterators():
+    flight = Flight()
+    flight.finish("whole reply")
+    assert list(flight.iter_chunks()) == ["whole reply"]
+
+
+def test_blocking_leader_shares_with_streaming_follower(fake_ollama):
+    fake = fake_ollama(token_delay=0.02, reply_tokens=REPLY_TOKENS)
+    (leader, follower), single_flight, _ = analyzers(fake)
+    results = {}
+    thread = threading.Thread(target=lambda: results.update(blocking=leader.analyze_entry(ENTRY)))
+    thread.start()
+    wait_until(lambda: single_flight._flights)
+
+    streamed = "".join(follower.analyze_entry_stream(ENTRY))
+    thread.join()
+
+    assert streamed
+    assert streamed == results['blocking']
+    assert chat_calls(fake) == 1
+
+
+def test_followers_do_not_double_count_tokens(fake_ollama):
+    fake = fake_ollama(token_delay=0.02, reply_tokens=REPLY_TOKENS)
+    (leader, follower), single_flight, metrics = analyzers(fake)
+    thread = threading.Thread(target=lambda: "".join(leader.analyze_entry_stream(ENTRY)))
+    thread.start()
+    wait_until(lambda: single_flight._flights)
+    "".join(follower.analyze_entry_stream(ENTRY))
+    thread.join()
+
+    totals = metrics.totals()[('analysis', leader.model_name)]
+    assert totals['calls'] == 2
+    assert totals['shared_flights'] == 1
+    assert totals['eval_count'] == REPLY_TOKENS
+
+
+def test_leader_cancel_does_not_cut_off_follower(fake_ollama):
+    fake = fake_ollama(token_delay=0.02, reply_tokens=REPLY_TOKENS)
+    (leader, follower), single_flight, _ = analyzers(fake)
+    leader_stream = leader.analyze_entry_stream(ENTRY)
+    next(leader_stream)
+    follower_stream = follower.analyze_entry_stream(ENTRY)
+    first = next(follower_stream)
+    leader_stream.close()
+
+    text = first + "".join(follower_stream)
+    assert len(text.split()) == REPLY_TOKENS
+    assert chat_calls(fake) == 1
+
+
+def test_sole_caller_cancel_stops_the_generation(fake_ollama):
+    fake = fake_ollama(token_delay=0.02, reply_tokens=REPLY_TOKENS)
+    (analyzer,), single_flight, _ = analyzers(fake, count=1)
+    stream = analyzer.analyze_entry_stream(ENTRY)
+    next(stream)
+    stream.close()
+
+    wait_until(lambda: not single_flight._flights)
+    # A later identical request starts a fresh generation rather than joining the abandoned one
+    assert len("".join(analyzer.analyze_entry_stream(ENTRY)).split()) == REPLY_TOKENS
+    assert chat_calls(fake) == 2